@@ -0,0 +1,85 @@
+"""Library analytics for /stats.
+
+Everything is derived from two grouped queries, each an index-only scan of
+the user's live books:
+
+* one grouped by (category, status, finish month) that also carries the
+  summed start-to-finish days, from which status counts, per-category and
+  per-month totals and the average completion time are folded in Python.
+  Only books currently marked finished count as finished: a book moved back
+  to reading keeps its finish_date but no longer has a finish month;
+* one counting books per author, cut to the top authors.
+
+The group counts are tiny (categories x statuses x months), so the Python
+side is negligible next to the scans. Category names and the few most
+recently finished books are small indexed lookups. Callers cache the result
+per user.
+"""
+
+TOP_AUTHORS = 10
+
+
+def library_summary(cur, user_id, top_authors=TOP_AUTHORS):
+    """Return the analytics dict for one user's library"""
+    cur.execute("""
+        SELECT category_id, reading_status,
+               IF(reading_status = 'finished', EXTRACT(YEAR_MONTH FROM finish_date), NULL) AS finish_month,
+               COUNT(*) AS books,
+               SUM(reading_status = 'finished' AND start_date IS NOT NULL AND finish_date >= start_date) AS completed,
+               SUM(IF(reading_status = 'finished' AND finish_date >= start_date,
+                      DATEDIFF(finish_date, start_date), 0)) AS completion_days
+        FROM books
+        WHERE user_id = %s AND deleted_at IS NULL
+        GROUP BY category_id, reading_status, finish_month
+    """, (user_id,))
+    groups = cur.fetchall()
+
+    cur.execute("SELECT id, name FROM categories WHERE user_id = %s AND deleted_at IS NULL", (user_id,))
+    names = {row['id']: row['name'] for row in cur.fetchall()}
+    for row in groups:
+        row['category_name'] = names.get(row['category_id'])
+
+    cur.execute("""
+        SELECT author, COUNT(*) AS books FROM books
+        WHERE user_id = %s AND deleted_at IS NULL AND author IS NOT NULL
+        GROUP BY author ORDER BY books DESC, author LIMIT %s
+    """, (user_id, top_authors))
+    authors = [(row['author'], row['books']) for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT title, author, finish_date FROM books
+        WHERE user_id = %s AND deleted_at IS NULL AND reading_status = 'finished' AND finish_date IS NOT NULL
+        ORDER BY finish_date DESC LIMIT 5
+    """, (user_id,))
+    summary = summarize(groups, authors)
+    summary['recent_finished'] = cur.fetchall()
+    return summary
+
+
+def summarize(groups, authors=()):
+    """Fold the grouped rows into the totals shown on /stats"""
+    total = 0
+    by_status = {}
+    by_category = {}
+    by_month = {}
+    completed = 0
+    completion_days = 0
+    for row in groups:
+        books = int(row['books'])
+        total += books
+        by_status[row['reading_status']] = by_status.get(row['reading_status'], 0) + books
+        name = row['category_name'] or 'Uncategorized'
+        by_category[name] = by_category.get(name, 0) + books
+        if row['finish_month']:
+            month = f"{row['finish_month'] // 100}-{row['finish_month'] % 100:02d}"
+            by_month[month] = by_month.get(month, 0) + books
+        completed += int(row['completed'] or 0)
+        completion_days += int(row['completion_days'] or 0)
+    return {
+        'total': total,
+        'by_status': by_status,
+        'by_category': sorted(by_category.items(), key=lambda item: (-item[1], item[0])),
+        'finished_by_month': sorted(by_month.items()),
+        'avg_completion_days': round(completion_days / completed, 1) if completed else None,
+        'top_authors': list(authors),
+    }
@@ -1,30 +1,26 @@
-from flask import Flask, render_template, render_template_string, request, redirect, url_for, flash, get_flashed_messages, send_file, session
-from flask_mysqldb import MySQL
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Blueprint, Response, current_app, jsonify, render_template, render_template_string, request, redirect, url_for, flash, get_flashed_messages, send_file, session
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
+from urllib.parse import urlencode
+from ratelimit import ConcurrencyLimiter, Metrics, make_backend
+from cache import FileHandleCache, LRUCache
+from dedupe import TitleIndex
+from enrichment import DiskCache, Enricher, make_provider, normalize_isbn
+from shards import DIRECTORY, ShardedMySQL, move_user, raise_id_floors
+import thumbnails
+import analytics
+import integrity
+import assets
+import click
+import math
 import os
-from pathlib import Path
+import threading
 #import webbrowser
-#import threading
 
 #def open_browser():
     #webbrowser.open_new("http://127.0.0.1:5000")
 
 
-app = Flask(__name__, template_folder='templates', static_folder='static')
-app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-
-# Session configuration
-app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
-
-# Database configuration - use environment variables for security
-app.config['MYSQL_HOST'] = os.environ.get('MYSQL_HOST', 'localhost')
-app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
-app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', 'Sree@123')
-app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'books')
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
-
 # File upload configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {
@@ -34,13 +30,121 @@ ALLOWED_EXTENSIONS = {
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+# Bump whenever init_tables() gains a table or column
+SCHEMA_VERSION = 14
+
+bp = Blueprint('main', __name__, cli_group=None)
+mysql = ShardedMySQL()
+metrics = Metrics()
+
+# Rendered /books cards, keyed by (book id, updated_at, ...)
+card_cache = LRUCache(int(os.environ.get('CARD_CACHE_SIZE', 20000)), metrics, 'card_cache')
+metrics.gauge('card_cache_hit_rate', card_cache.hit_rate)
+metrics.gauge('card_cache_entries', card_cache.__len__)
+
+# Open upload files shared by /stream range requests
+file_handles = FileHandleCache(int(os.environ.get('OPEN_FILE_CACHE', 64)))
+
+# Per-user fuzzy title indexes for duplicate detection, built in the background
+# and caught up by change_seq after a TTL so edits made through other worker
+# processes are picked up
+title_indexes = LRUCache(int(os.environ.get('DEDUPE_INDEX_USERS', 64)), metrics, 'title_index')
+DEDUPE_INDEX_TTL = int(os.environ.get('DEDUPE_INDEX_TTL', 60))
+
+# /stats analytics per user, keyed by (user id, sync counter)
+analytics_cache = LRUCache(int(os.environ.get('ANALYTICS_CACHE_USERS', 1000)), metrics, 'analytics')
+
+# Most changed rows /sync returns per call
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+
+def create_app(config=None):
+    """Application factory: build the Flask app without touching the database.
+
+    Tables are created lazily by ensure_schema() on the first request, so WSGI
+    workers get the schema too and cold start does no DDL round trips.
+    """
+    app = Flask(__name__, template_folder='templates', static_folder='static')
+    app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+
+    # Session configuration
+    app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
+
+    # Database configuration - use environment variables for security
+    app.config['MYSQL_HOST'] = os.environ.get('MYSQL_HOST', 'localhost')
+    app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
+    app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', 'Sree@123')
+    app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'books')
+    app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
+
+    # Sharding by user_id: comma separated mysql://user:pw@host/db URLs (the
+    # first is the directory shard), optional user_id ranges like
+    # '0-99999:0,100000-:1' for placing new users (others are hashed), and
+    # how long processes cache a user's placement from the directory
+    app.config['MYSQL_SHARDS'] = [u for u in os.environ.get('MYSQL_SHARDS', '').split(',') if u.strip()]
+    app.config['SHARD_RANGES'] = os.environ.get('SHARD_RANGES')
+    app.config['SHARD_MAP_TTL'] = int(os.environ.get('SHARD_MAP_TTL', 30))
+    app.config['SHARD_MAP_USERS'] = int(os.environ.get('SHARD_MAP_USERS', 100000))
+    app.config['SHARD_ID_STRIDE'] = 64  # upper bound on the shard count; never change once ids are issued
+
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
-# Create upload folder if it doesn't exist
-Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
+    # Rate limiting - leave storage unset for per-process buckets, or point it
+    # at redis://... to share buckets between workers
+    app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')
+    app.config['RATELIMIT_IP_FACTOR'] = 4  # an IP may be shared by several users
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is
+    # trusted; without it every client behind the proxy shares one IP bucket
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
 
-mysql = MySQL(app)
+    # Responses smaller than this are sent uncompressed
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+
+    # ISBN metadata enrichment: 'openlibrary[:<base url>]', 'fixture:<json path>' or 'none'
+    app.config['ENRICHMENT_PROVIDER'] = os.environ.get('ENRICHMENT_PROVIDER', 'openlibrary')
+    app.config['ENRICHMENT_CACHE'] = os.environ.get('ENRICHMENT_CACHE', os.path.join('cache', 'enrichment.sqlite3'))
+    app.config['ENRICHMENT_CACHE_TTL'] = int(os.environ.get('ENRICHMENT_CACHE_TTL', 30 * 24 * 3600))
+    app.config['ENRICHMENT_WORKERS'] = int(os.environ.get('ENRICHMENT_WORKERS', 8))
+
+    # Cover thumbnails (content-addressed, LRU-trimmed to the quota)
+    app.config['THUMBNAIL_FOLDER'] = os.environ.get('THUMBNAIL_FOLDER', os.path.join('cache', 'covers'))
+    app.config['THUMBNAIL_QUOTA'] = int(os.environ.get('THUMBNAIL_QUOTA_MB', 500)) * 1024 * 1024
+    app.config['THUMBNAIL_WORKERS'] = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+    # Deleted books are purged in the background every PURGE_INTERVAL seconds (0 disables)
+    app.config['PURGE_INTERVAL'] = int(os.environ.get('PURGE_INTERVAL', 300))
+    app.config['PURGE_BATCH_SIZE'] = int(os.environ.get('PURGE_BATCH_SIZE', 500))
+
+    # Upload/database integrity scan: one of INTEGRITY_BUCKETS slices every INTEGRITY_INTERVAL seconds (0 disables)
+    app.config['INTEGRITY_INTERVAL'] = int(os.environ.get('INTEGRITY_INTERVAL', 3600))
+    app.config['INTEGRITY_BUCKETS'] = int(os.environ.get('INTEGRITY_BUCKETS', 24))
+    app.config['INTEGRITY_REPAIR'] = os.environ.get('INTEGRITY_REPAIR', '0') == '1'
+    app.config['INTEGRITY_MIN_AGE'] = int(os.environ.get('INTEGRITY_MIN_AGE', 3600))
+    app.config['INTEGRITY_STATE'] = os.environ.get('INTEGRITY_STATE', os.path.join('cache', 'integrity.json'))
+
+    if config:
+        app.config.update(config)
+
+    if app.config['TRUSTED_PROXIES']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    app.extensions['ratelimit'] = make_backend(app.config['RATELIMIT_STORAGE_URL'])
+    mysql.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
+_app = None
+
+def __getattr__(name):
+    """Keep `from app import app` working while building it only on first access"""
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -56,8 +160,121 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def too_busy(status, retry_after):
+    """Plain response for throttled (429) or shed (503) requests"""
+    retry_after = max(1, math.ceil(retry_after))
+    message = 'Too many requests' if status == 429 else 'Server is busy'
+    return f'{message}, please retry in {retry_after} second(s).', status, {'Retry-After': str(retry_after)}
+
+def rate_limited(name, rate, burst, concurrency=None, queue=0, queue_timeout=5, when=None, key=None):
+    """Decorator to throttle a route per IP and per user with token buckets.
+
+    rate is tokens refilled per second and burst the bucket size. `when`
+    limits throttling to the expensive variant of a route, `key` adds an
+    extra bucket (e.g. username and IP on login, so nobody can lock a
+    victim out from elsewhere). With `concurrency`, at most
+    that many requests run at once in this process, `queue` more wait up to
+    `queue_timeout` seconds and the rest are shed with 503.
+    """
+    limiter = ConcurrencyLimiter(name, concurrency, queue, queue_timeout, metrics) if concurrency else None
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config['RATELIMIT_ENABLED'] or (when and not when()):
+                return f(*args, **kwargs)
+            backend = current_app.extensions['ratelimit']
+            ip_factor = current_app.config['RATELIMIT_IP_FACTOR']
+            buckets = [(f'{name}:ip:{request.remote_addr}', rate * ip_factor, burst * ip_factor)]
+            if 'user_id' in session:
+                buckets.append((f'{name}:user:{session["user_id"]}', rate, burst))
+            extra = key() if key else None
+            if extra:
+                buckets.append((f'{name}:key:{extra}', rate, burst))
+            for bucket, bucket_rate, capacity in buckets:
+                allowed, retry_after = backend.take(bucket, bucket_rate, capacity)
+                if not allowed:
+                    metrics.incr(f'{name}_throttled')
+                    return too_busy(429, retry_after)
+            if limiter is None:
+                return f(*args, **kwargs)
+            if not limiter.acquire():
+                return too_busy(503, queue_timeout)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                limiter.release()
+        return decorated_function
+    return decorator
+
+def add_column_if_missing(cur, table, column, definition):
+    """ALTER an existing table created before the column was introduced"""
+    cur.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if cur.fetchone() is None:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def add_index_if_missing(cur, table, index, columns):
+    """CREATE INDEX on an existing table unless it is already there"""
+    cur.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    if cur.fetchone() is None:
+        cur.execute(f"CREATE INDEX {index} ON {table} {columns}")
+
 def init_tables():
-    """Create users and books tables if missing"""
+    """Create all tables on every shard if missing, one worker at a time per shard"""
+    ready = True
+    for shard in mysql.shard_ids():
+        with mysql.using(shard):
+            cur = mysql.connection.cursor()
+            cur.execute("SELECT GET_LOCK('bookmaster_schema', 300) AS locked")
+            if not cur.fetchone()['locked']:
+                print(f"❌ Timed out waiting for the schema lock on shard {shard}")
+                cur.close()
+                ready = False
+                continue
+            try:
+                ready = (stored_schema_version(cur) >= SCHEMA_VERSION or init_shard_tables()) and ready
+                if shard == DIRECTORY and len(mysql.shard_ids()) > 1:
+                    backfill_placements(cur)
+            finally:
+                cur.execute("SELECT RELEASE_LOCK('bookmaster_schema')")
+                cur.close()
+    if ready and len(mysql.shard_ids()) > 1:
+        raise_id_floors(mysql)
+    return ready
+
+def backfill_placements(cur, batch_size=10000):
+    """Give every user without a user_shards row one on the directory shard.
+
+    Those users registered before sharding was enabled, so all their rows are
+    there; writing it down keeps them there whatever the shard count becomes.
+    """
+    while True:
+        rows = cur.execute("""
+            INSERT IGNORE INTO user_shards (user_id, shard)
+            SELECT u.id, %s FROM users u LEFT JOIN user_shards s ON s.user_id = u.id
+            WHERE s.user_id IS NULL LIMIT %s
+        """, (DIRECTORY, batch_size))
+        mysql.directory.commit()
+        if rows < batch_size:
+            break
+
+def stored_schema_version(cur):
+    """Version recorded on a shard, 0 before the first migration"""
+    try:
+        cur.execute("SELECT version FROM schema_version WHERE id = 1")
+        row = cur.fetchone()
+        return row['version'] if row else 0
+    except Exception:
+        return 0
+
+def init_shard_tables():
+    """Create all tables on the current shard if missing and record the schema version"""
     try:
         cur = mysql.connection.cursor()
         
@@ -80,6 +297,9 @@ def init_tables():
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
         """)
+        # Deleted categories are hidden at once; purge_deleted_categories() detaches their books later
+        add_column_if_missing(cur, 'categories', 'deleted_at', "DATETIME NULL")
+        add_index_if_missing(cur, 'categories', 'idx_categories_deleted', "(deleted_at)")
         
         # Create books table
         cur.execute("""
@@ -96,43 +316,227 @@ def init_tables():
             current_page INT DEFAULT 0,
             start_date DATE,
             finish_date DATE,
+            updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
             FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
         )
         """)
-        
-        
+        add_column_if_missing(cur, 'books', 'updated_at',
+                              "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+        add_column_if_missing(cur, 'books', 'isbn', "VARCHAR(13)")
+        add_column_if_missing(cur, 'books', 'cover_url', "VARCHAR(500)")
+        add_index_if_missing(cur, 'books', 'idx_books_user_isbn', "(user_id, isbn)")
+        add_column_if_missing(cur, 'books', 'cover_key', "CHAR(64)")
+        add_index_if_missing(cur, 'books', 'idx_books_user_cover', "(user_id, cover_key)")
+        # Deleted books are hidden at once and hard-deleted later by purge_deleted_books()
+        add_column_if_missing(cur, 'books', 'deleted_at', "DATETIME NULL")
+        add_index_if_missing(cur, 'books', 'idx_books_user_deleted', "(user_id, deleted_at)")
+        add_index_if_missing(cur, 'books', 'idx_books_deleted', "(deleted_at)")
+        # Covering indexes for the /stats analytics scans
+        add_index_if_missing(cur, 'books', 'idx_books_user_analytics',
+                             "(user_id, deleted_at, reading_status, finish_date, category_id, start_date)")
+        add_index_if_missing(cur, 'books', 'idx_books_user_author', "(user_id, deleted_at, author)")
+        # Upload lookups by name for the storage integrity scan
+        add_index_if_missing(cur, 'books', 'idx_books_file_name', "(file_name)")
+
+        # Create tags table
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) NOT NULL,
+            user_id INT NOT NULL,
+            UNIQUE KEY unique_tag_per_user (user_id, name),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """)
+
+        # Create book_tags junction table (indexed both ways for filtering and facets)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS book_tags (
+            book_id INT NOT NULL,
+            tag_id INT NOT NULL,
+            PRIMARY KEY (book_id, tag_id),
+            KEY idx_tag_book (tag_id, book_id),
+            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
+            FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE
+        )
+        """)
+
+        # Create append-only reading events log (raw history, compacted periodically)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS reading_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            book_id INT NOT NULL,
+            pages_read INT NOT NULL DEFAULT 0,
+            current_page INT NOT NULL DEFAULT 0,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_events_created (created_at),
+            KEY idx_events_user_created (user_id, created_at)
+        )
+        """)
+        # Purged books take their raw events with them
+        add_index_if_missing(cur, 'reading_events', 'idx_events_book', "(book_id)")
+
+        # Create daily reading rollup used by /stats
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS reading_daily (
+            user_id INT NOT NULL,
+            day DATE NOT NULL,
+            pages_read INT NOT NULL DEFAULT 0,
+            sessions INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """)
+
+        # Delta sync: every book/category write takes the next value of its
+        # owner's counter (see create_sync_triggers), deletes leave tombstones
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_cursors (
+            user_id INT PRIMARY KEY,
+            seq BIGINT NOT NULL DEFAULT 0,
+            pruned_seq BIGINT NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            user_id INT NOT NULL,
+            seq BIGINT NOT NULL,
+            entity ENUM('book', 'category') NOT NULL,
+            entity_id INT NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, seq),
+            KEY idx_tombstones_created (created_at)
+        )
+        """)
+        for table in ('books', 'categories'):
+            add_column_if_missing(cur, table, 'change_seq', "BIGINT NOT NULL DEFAULT 0")
+            add_index_if_missing(cur, table, f'idx_{table}_user_seq', "(user_id, change_seq)")
+        create_sync_triggers(cur)
+        number_unsynced_rows(cur)
+
+        # Every user's shard, written at registration and by `flask move-user` (read on the directory shard)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_shards (
+            user_id INT PRIMARY KEY,
+            shard INT NOT NULL,
+            moving TINYINT(1) NOT NULL DEFAULT 0
+        )
+        """)
+        add_index_if_missing(cur, 'user_shards', 'idx_user_shards_moving', "(moving)")
+
+        # Single-row schema version, probed once per process by ensure_schema()
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id TINYINT PRIMARY KEY,
+            version INT NOT NULL
+        )
+        """)
+        cur.execute("""
+            INSERT INTO schema_version (id, version) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE version = VALUES(version)
+        """, (SCHEMA_VERSION,))
+
         mysql.connection.commit()
         cur.close()
         print("✅ Tables initialized successfully")
+        return True
     except Exception as e:
         print(f"❌ Error initializing tables: {e}")
+        return False
+
+def create_sync_triggers(cur):
+    """Create the triggers that stamp change_seq and record tombstones, if missing"""
+    cur.execute("SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE()")
+    existing = {row['TRIGGER_NAME'] for row in cur.fetchall()}
+    bump = """
+        INSERT INTO sync_cursors (user_id, seq) VALUES ({row}.user_id, 1)
+        ON DUPLICATE KEY UPDATE seq = seq + 1;"""
+    for table, entity in (('books', 'book'), ('categories', 'category')):
+        for event in ('INSERT', 'UPDATE'):
+            if f'{table}_sync_{event.lower()}' not in existing:
+                cur.execute(f"""
+                    CREATE TRIGGER {table}_sync_{event.lower()} BEFORE {event} ON {table} FOR EACH ROW
+                    BEGIN
+                        {bump.format(row='NEW')}
+                        SET NEW.change_seq = (SELECT seq FROM sync_cursors WHERE user_id = NEW.user_id);
+                    END""")
+        if f'{table}_sync_delete' not in existing:
+            cur.execute(f"""
+                CREATE TRIGGER {table}_sync_delete AFTER DELETE ON {table} FOR EACH ROW
+                BEGIN
+                    {bump.format(row='OLD')}
+                    INSERT INTO sync_tombstones (user_id, seq, entity, entity_id)
+                    SELECT user_id, seq, '{entity}', OLD.id FROM sync_cursors WHERE user_id = OLD.user_id;
+                END""")
+
+def number_unsynced_rows(cur, batch_size=1000):
+    """Number rows written before sync existed by passing them through the update trigger in committed batches"""
+    for table, touch in (('books', 'updated_at = updated_at'), ('categories', 'change_seq = 0')):
+        last_id = 0
+        while True:
+            cur.execute(f"SELECT id FROM {table} WHERE id > %s AND change_seq = 0 AND user_id IS NOT NULL ORDER BY id LIMIT %s",
+                        (last_id, batch_size))
+            ids = [row['id'] for row in cur.fetchall()]
+            if not ids:
+                break
+            cur.execute(f"UPDATE {table} SET {touch} WHERE change_seq = 0 AND id IN ({', '.join(['%s'] * len(ids))})", ids)
+            mysql.connection.commit()
+            last_id = ids[-1]
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+@bp.before_app_request
+def ensure_schema():
+    """Run init_tables() once per process, only if the stored version is behind"""
+    global _schema_ready
+    if _schema_ready or request.endpoint in ('main.index', 'main.metrics_endpoint', 'main.serve_asset', 'static'):
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        current = SCHEMA_VERSION
+        for shard in mysql.shard_ids():
+            try:
+                cur = mysql.shard(shard).cursor()
+                current = min(current, stored_schema_version(cur))
+                cur.close()
+            except Exception:
+                current = 0
+        _schema_ready = current >= SCHEMA_VERSION or init_tables()
+
+@bp.before_app_request
+def hold_writes_while_moving():
+    """Refuse writes from a user whose rows are being copied to another shard"""
+    if request.method in ('GET', 'HEAD') or 'user_id' not in session:
+        return
+    if len(mysql.shard_ids()) > 1 and mysql.is_moving(session['user_id']):
+        return too_busy(503, current_app.config['SHARD_MAP_TTL'])
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def get_all_books(category_id=None):
-    """Fetch all books for current user, optionally filtered by category"""
+def get_all_books(category_id=None, tag_ids=None, tag_mode='all'):
+    """Fetch all books for current user, optionally filtered by category and tags"""
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
+        query = """
+            SELECT b.*, c.name as category_name
+            FROM books b
+            LEFT JOIN categories c ON b.category_id = c.id AND c.deleted_at IS NULL
+            WHERE b.user_id = %s AND b.deleted_at IS NULL"""
+        params = [user_id]
         if category_id:
-            cur.execute("""
-                SELECT b.*, c.name as category_name 
-                FROM books b 
-                LEFT JOIN categories c ON b.category_id = c.id 
-                WHERE b.user_id = %s AND b.category_id = %s 
-                ORDER BY b.id
-            """, (user_id, category_id))
-        else:
-            cur.execute("""
-                SELECT b.*, c.name as category_name 
-                FROM books b 
-                LEFT JOIN categories c ON b.category_id = c.id 
-                WHERE b.user_id = %s 
-                ORDER BY b.id
-            """, (user_id,))
+            query += " AND b.category_id = %s"
+            params.append(category_id)
+        tag_sql, tag_params = tag_filter_clause(tag_ids, tag_mode)
+        query += tag_sql + " ORDER BY b.id"
+        cur.execute(query, params + tag_params)
         books = cur.fetchall()
         cur.close()
         return books
@@ -140,12 +544,716 @@ def get_all_books(category_id=None):
         print(f"Error fetching books: {e}")
         return []
 
+def parse_ids(values):
+    """Keep only numeric ids from query string or form values"""
+    return sorted({int(v) for v in values if str(v).isdigit()})
+
+def parse_tag_names(text):
+    """Split a comma separated tag string into unique, trimmed names"""
+    names = []
+    seen = set()
+    for raw in (text or '').split(','):
+        name = raw.strip()[:50]
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+def tag_filter_clause(tag_ids, tag_mode='all'):
+    """Build the SQL fragment restricting books (aliased b) to the given tags.
+
+    'all' keeps books carrying every tag, 'any' keeps books carrying at least one.
+    Both are resolved in the same query through the (tag_id, book_id) index.
+    """
+    if not tag_ids:
+        return '', []
+    placeholders = ', '.join(['%s'] * len(tag_ids))
+    if tag_mode == 'any':
+        sql = f" AND EXISTS (SELECT 1 FROM book_tags bt WHERE bt.book_id = b.id AND bt.tag_id IN ({placeholders}))"
+        return sql, list(tag_ids)
+    sql = f""" AND b.id IN (
+                SELECT bt.book_id FROM book_tags bt
+                WHERE bt.tag_id IN ({placeholders})
+                GROUP BY bt.book_id HAVING COUNT(*) = %s)"""
+    return sql, list(tag_ids) + [len(tag_ids)]
+
+def get_tag_counts():
+    """Fetch all tags for current user with their book counts in a single grouped query"""
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        cur.execute("""
+            SELECT t.id, t.name, COUNT(b.id) as count
+            FROM tags t
+            LEFT JOIN book_tags bt ON bt.tag_id = t.id
+            LEFT JOIN books b ON b.id = bt.book_id AND b.deleted_at IS NULL
+            WHERE t.user_id = %s
+            GROUP BY t.id, t.name
+            ORDER BY t.name
+        """, (user_id,))
+        tags = cur.fetchall()
+        cur.close()
+        return tags
+    except Exception as e:
+        print(f"Error fetching tags: {e}")
+        return []
+
+def get_book_tags(book_ids):
+    """Map book id -> list of tag rows for the given books of the current user"""
+    book_tags = {}
+    if not book_ids:
+        return book_tags
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        query = """
+            SELECT bt.book_id, t.id, t.name
+            FROM book_tags bt
+            JOIN tags t ON t.id = bt.tag_id
+            WHERE t.user_id = %s"""
+        params = [user_id]
+        # Large listings read the user's whole tag map instead of a huge IN list
+        if len(book_ids) <= 1000:
+            query += f" AND bt.book_id IN ({', '.join(['%s'] * len(book_ids))})"
+            params.extend(book_ids)
+        cur.execute(query + " ORDER BY t.name", params)
+        wanted = set(book_ids)
+        for row in cur.fetchall():
+            if row['book_id'] in wanted:
+                book_tags.setdefault(row['book_id'], []).append(row)
+        cur.close()
+    except Exception as e:
+        print(f"Error fetching book tags: {e}")
+    return book_tags
+
+def set_book_tags(cur, book_id, user_id, names):
+    """Replace the tags of a book owned by user_id (caller commits)"""
+    cur.execute("""
+        DELETE bt FROM book_tags bt
+        JOIN books b ON b.id = bt.book_id
+        WHERE bt.book_id = %s AND b.user_id = %s
+    """, (book_id, user_id))
+    if not names:
+        return
+    cur.executemany("INSERT IGNORE INTO tags (name, user_id) VALUES (%s, %s)",
+                    [(name, user_id) for name in names])
+    placeholders = ', '.join(['%s'] * len(names))
+    cur.execute(f"""
+        INSERT IGNORE INTO book_tags (book_id, tag_id)
+        SELECT b.id, t.id FROM books b
+        JOIN tags t ON t.user_id = b.user_id
+        WHERE b.id = %s AND b.user_id = %s AND t.name IN ({placeholders})
+    """, [book_id, user_id] + list(names))
+
+def add_book_tags(user_id, book_ids, names, batch_size=1000):
+    """Add tags to many of the user's books with one INSERT ... SELECT per chunk.
+
+    Returns the number of new book/tag links.
+    """
+    if not names:
+        return 0
+    added = 0
+    cur = mysql.connection.cursor()
+    cur.executemany("INSERT IGNORE INTO tags (name, user_id) VALUES (%s, %s)",
+                    [(name, user_id) for name in names])
+    name_placeholders = ', '.join(['%s'] * len(names))
+    for start in range(0, len(book_ids), batch_size):
+        chunk = book_ids[start:start + batch_size]
+        added += cur.execute(f"""
+            INSERT IGNORE INTO book_tags (book_id, tag_id)
+            SELECT b.id, t.id FROM books b
+            JOIN tags t ON t.user_id = b.user_id
+            WHERE b.user_id = %s AND b.deleted_at IS NULL
+              AND b.id IN ({', '.join(['%s'] * len(chunk))}) AND t.name IN ({name_placeholders})
+        """, [user_id] + chunk + list(names))
+        # Tags live in book_tags; touch the books so /sync picks the change up
+        cur.execute(f"UPDATE books SET updated_at = CURRENT_TIMESTAMP(6) WHERE user_id = %s AND id IN ({', '.join(['%s'] * len(chunk))})",
+                    [user_id] + chunk)
+        mysql.connection.commit()
+    cur.close()
+    card_cache.invalidate_many(book_ids)
+    return added
+
+def record_reading_event(cur, book_id, user_id, current_page):
+    """Append a reading event and bump the daily rollup (caller commits).
+
+    Must run before books.current_page is overwritten, since pages read are
+    derived from the stored page in the same statement.
+    """
+    cur.execute("""
+        INSERT INTO reading_events (user_id, book_id, pages_read, current_page)
+        SELECT user_id, id, GREATEST(%s - COALESCE(current_page, 0), 0), %s
+        FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL
+    """, (current_page, current_page, book_id, user_id))
+    cur.execute("""
+        INSERT INTO reading_daily (user_id, day, pages_read, sessions)
+        SELECT user_id, CURDATE(), GREATEST(%s - COALESCE(current_page, 0), 0), 1
+        FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL
+        ON DUPLICATE KEY UPDATE
+            pages_read = reading_daily.pages_read + VALUES(pages_read),
+            sessions = reading_daily.sessions + 1
+    """, (current_page, book_id, user_id))
+
+def get_reading_history(days=365):
+    """Fetch the current user's daily rollup rows (newest last) for the last N days"""
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        cur.execute("""
+            SELECT day, pages_read, sessions FROM reading_daily
+            WHERE user_id = %s AND day >= CURDATE() - INTERVAL %s DAY
+            ORDER BY day
+        """, (user_id, days))
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    except Exception as e:
+        print(f"Error fetching reading history: {e}")
+        return []
+
+def summarize_reading_history(rows, today=None):
+    """Compute streaks, pace and weekly totals from daily rollup rows"""
+    from datetime import date, timedelta
+    today = today or date.today()
+    pages_by_day = {row['day']: row['pages_read'] for row in rows if row['pages_read'] > 0}
+
+    # Current streak may end today or yesterday (today not read yet)
+    streak = 0
+    day = today if today in pages_by_day else today - timedelta(days=1)
+    while day in pages_by_day:
+        streak += 1
+        day -= timedelta(days=1)
+
+    longest = 0
+    run = 0
+    previous = None
+    for day in sorted(pages_by_day):
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    weekly = {}
+    for day, pages in pages_by_day.items():
+        week_start = day - timedelta(days=day.weekday())
+        weekly[week_start] = weekly.get(week_start, 0) + pages
+
+    active_days = len(pages_by_day)
+    total_pages = sum(pages_by_day.values())
+    return {
+        'current_streak': streak,
+        'longest_streak': longest,
+        'pages_per_active_day': round(total_pages / active_days, 1) if active_days else 0,
+        'last_30_days': [(today - timedelta(days=n), pages_by_day.get(today - timedelta(days=n), 0)) for n in range(29, -1, -1)],
+        'weekly': sorted(weekly.items())[-12:],
+    }
+
+def compact_reading_events(retention_days=90, batch_size=10000):
+    """Delete raw reading events older than the retention window in small batches.
+
+    Rollups already hold the aggregated history, so raw rows are only kept
+    for recent auditing. Returns the number of deleted rows.
+    """
+    deleted = 0
+    cur = mysql.connection.cursor()
+    while True:
+        rows = cur.execute(
+            "DELETE FROM reading_events WHERE created_at < NOW() - INTERVAL %s DAY ORDER BY id LIMIT %s",
+            (retention_days, batch_size)
+        )
+        mysql.connection.commit()
+        deleted += rows
+        if rows < batch_size:
+            break
+    cur.close()
+    return deleted
+
+def update_books(user_id, book_ids, assignments, params=(), batch_size=1000):
+    """Apply one SET clause to many of the user's books as chunked set-based UPDATEs.
+
+    Each chunk is one short primary-key UPDATE in its own transaction; cached
+    cards are dropped once at the end. Returns the number of rows changed.
+    """
+    changed = 0
+    cur = mysql.connection.cursor()
+    for start in range(0, len(book_ids), batch_size):
+        chunk = book_ids[start:start + batch_size]
+        changed += cur.execute(
+            f"UPDATE books SET {assignments} WHERE user_id = %s AND deleted_at IS NULL AND id IN ({', '.join(['%s'] * len(chunk))})",
+            list(params) + [user_id] + chunk
+        )
+        mysql.connection.commit()
+    cur.close()
+    card_cache.invalidate_many(book_ids)
+    return changed
+
+def soft_delete_books(user_id, book_ids):
+    """Hide books from every listing at once; purge_deleted_books() removes rows and files later"""
+    deleted = update_books(user_id, book_ids, "deleted_at = NOW()")
+    index = cached_title_index(user_id)
+    if index is not None:
+        for book_id in book_ids:
+            index.remove(book_id)
+    return deleted
+
+def purge_deleted_books(batch_size=500):
+    """Hard-delete soft-deleted books, their raw reading events and upload files in small batches.
+
+    Every batch is its own short transaction (book_tags rows follow through
+    ON DELETE CASCADE), so purging a large bulk delete never holds row locks
+    for long. Returns the number of purged books.
+    """
+    purged = 0
+    cur = mysql.connection.cursor()
+    while True:
+        cur.execute("SELECT id, user_id, file_name FROM books WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT %s",
+                    (batch_size,))
+        fetched = cur.fetchall()
+        # Rows of a user being moved are being copied right now; they are purged after the move
+        rows = [row for row in fetched if not mysql.is_moving(row['user_id'])]
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+        placeholders = ', '.join(['%s'] * len(ids))
+        cur.execute(f"DELETE FROM books WHERE deleted_at IS NOT NULL AND id IN ({placeholders})", ids)
+        cur.execute(f"DELETE FROM reading_events WHERE book_id IN ({placeholders})", ids)
+        mysql.connection.commit()
+        for row in rows:
+            if not row['file_name']:
+                continue
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], row['file_name'])
+            file_handles.discard(file_path)
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as fe:
+                print(f"Warning: Could not delete file: {fe}")
+        purged += len(rows)
+        if len(fetched) < batch_size:
+            break
+    cur.close()
+    return purged
+
+def purge_worker(app):
+    """Background loop purging soft-deleted books and categories every PURGE_INTERVAL seconds.
+
+    Each worker process runs one; a MySQL named lock per shard lets only one
+    of them purge a shard at a time.
+    """
+    import time
+    while True:
+        time.sleep(app.config['PURGE_INTERVAL'])
+        with app.app_context():
+            for shard in mysql.shard_ids():
+                try:
+                    with mysql.using(shard):
+                        cur = mysql.connection.cursor()
+                        cur.execute("SELECT GET_LOCK('bookmaster_purge', 0) AS locked")
+                        if cur.fetchone()['locked']:
+                            try:
+                                metrics.incr('books_purged', purge_deleted_books(app.config['PURGE_BATCH_SIZE']))
+                                metrics.incr('categories_purged', purge_deleted_categories(app.config['PURGE_BATCH_SIZE']))
+                            finally:
+                                cur.execute("SELECT RELEASE_LOCK('bookmaster_purge')")
+                        cur.close()
+                except Exception as e:
+                    print(f"Error purging deleted books on shard {shard}: {e}")
+
+def referenced_file_names(names):
+    """The subset of upload names some book row (live or soft-deleted) points at, on any shard"""
+    referenced = set()
+    for shard in mysql.shard_ids():
+        cur = mysql.shard(shard).cursor()
+        cur.execute(f"SELECT file_name FROM books WHERE file_name IN ({', '.join(['%s'] * len(names))})", names)
+        referenced.update(row['file_name'] for row in cur.fetchall())
+        cur.close()
+    return referenced
+
+def scan_storage_bucket(bucket, buckets, repair=False, batch_size=1000, min_age=3600, sample=20):
+    """Report (and with repair, fix) orphan files and dangling file_name values in one hash bucket"""
+    folder = current_app.config['UPLOAD_FOLDER']
+    report = {'bucket': bucket, 'buckets': buckets, 'files': 0, 'orphans': 0, 'dangling': 0,
+              'orphan_sample': [], 'dangling_sample': [], 'repaired': 0, 'repair_skipped': 0}
+
+    if os.path.isdir(folder):
+        for names in integrity.iter_upload_batches(folder, bucket, buckets, batch_size, min_age):
+            report['files'] += len(names)
+            referenced = referenced_file_names(names)
+            orphans = [name for name in names if name not in referenced]
+            report['orphans'] += len(orphans)
+            report['orphan_sample'].extend(orphans[:sample - len(report['orphan_sample'])])
+            if not repair or not orphans:
+                continue
+            if mysql.moves_in_progress():
+                report['repair_skipped'] += len(orphans)
+                continue
+            referenced = referenced_file_names(orphans)
+            for name in orphans:
+                if name in referenced:
+                    continue
+                try:
+                    file_handles.discard(os.path.join(folder, name))
+                    integrity.quarantine(folder, name)
+                    report['repaired'] += 1
+                except OSError as e:
+                    print(f"Warning: Could not quarantine {name}: {e}")
+
+    for shard in mysql.shard_ids():
+        with mysql.using(shard):
+            cur = mysql.connection.cursor()
+            last_id = 0
+            while True:
+                cur.execute("""
+                    SELECT id, user_id, file_name FROM books
+                    WHERE id > %s AND file_name IS NOT NULL AND deleted_at IS NULL AND CRC32(file_name) %% %s = %s
+                    ORDER BY id LIMIT %s
+                """, (last_id, buckets, bucket, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                missing = {}
+                for row in rows:
+                    if os.path.exists(os.path.join(folder, row['file_name'])):
+                        continue
+                    report['dangling'] += 1
+                    if len(report['dangling_sample']) < sample:
+                        report['dangling_sample'].append((shard, row['id'], row['file_name']))
+                    missing.setdefault(row['user_id'], []).append(row['id'])
+                if repair:
+                    for user_id, book_ids in missing.items():
+                        # Rows of a user being moved are copied elsewhere right now; fix them next round
+                        if mysql.is_moving(user_id):
+                            continue
+                        report['repaired'] += update_books(user_id, book_ids, "file_name = NULL")
+                last_id = rows[-1]['id']
+                if len(rows) < batch_size:
+                    break
+            cur.close()
+    return report
+
+def scan_storage(repair=False, all_buckets=False, min_interval=0):
+    """Scan the next bucket (or all), unless the checkpoint's last run is under min_interval seconds old"""
+    import time
+    config = current_app.config
+    state = integrity.load_checkpoint(config['INTEGRITY_STATE'])
+    if min_interval and time.time() - state.get('last_run', 0) < min_interval:
+        return []
+    buckets = config['INTEGRITY_BUCKETS']
+    if state.get('buckets') != buckets:
+        state = {'bucket': 0, 'buckets': buckets}
+    reports = []
+    for _ in range(buckets if all_buckets else 1):
+        report = scan_storage_bucket(state['bucket'], buckets, repair, min_age=config['INTEGRITY_MIN_AGE'])
+        metrics.incr('storage_orphans', report['orphans'])
+        metrics.incr('storage_dangling', report['dangling'])
+        reports.append(report)
+        state['bucket'] = (state['bucket'] + 1) % buckets
+        state['last_run'] = time.time()
+        integrity.save_checkpoint(config['INTEGRITY_STATE'], state)
+    return reports
+
+def integrity_worker(app):
+    """Background loop scanning one storage bucket every INTEGRITY_INTERVAL seconds"""
+    import time
+    interval = app.config['INTEGRITY_INTERVAL']
+    while True:
+        time.sleep(min(interval, 60))
+        with app.app_context():
+            try:
+                cur = mysql.directory.cursor()
+                cur.execute("SELECT GET_LOCK('bookmaster_integrity', 0) AS locked")
+                if cur.fetchone()['locked']:
+                    try:
+                        for report in scan_storage(app.config['INTEGRITY_REPAIR'], min_interval=interval):
+                            if report['orphans'] or report['dangling']:
+                                print(f"Storage scan bucket {report['bucket']}/{report['buckets']}: "
+                                      f"{report['orphans']} orphan file(s), {report['dangling']} dangling reference(s)")
+                    finally:
+                        cur.execute("SELECT RELEASE_LOCK('bookmaster_integrity')")
+                cur.close()
+            except Exception as e:
+                print(f"Error scanning storage: {e}")
+
+_workers_started = False
+_workers_lock = threading.Lock()
+
+@bp.before_app_request
+def start_background_workers():
+    """Start this process's purge and integrity threads on its first request (threads do not survive a fork)"""
+    global _workers_started
+    if _workers_started:
+        return
+    with _workers_lock:
+        if _workers_started:
+            return
+        app = current_app._get_current_object()
+        if app.config['PURGE_INTERVAL']:
+            threading.Thread(target=purge_worker, args=(app,), name='purge', daemon=True).start()
+        if app.config['INTEGRITY_INTERVAL']:
+            threading.Thread(target=integrity_worker, args=(app,), name='integrity', daemon=True).start()
+        _workers_started = True
+
+def soft_delete_category(category_id, user_id):
+    """Hide a category at once; purge_deleted_categories() detaches its books later.
+
+    Returns the number of categories hidden (0 or 1).
+    """
+    cur = mysql.connection.cursor()
+    rows = cur.execute("UPDATE categories SET deleted_at = NOW() WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+                       (category_id, user_id))
+    mysql.connection.commit()
+    cur.close()
+    return rows
+
+def detach_category(category_id, user_id, batch_size=1000):
+    """Clear a deleted category from its books in short batches, then delete it.
+
+    Deleting the row straight away would make ON DELETE SET NULL rewrite all
+    of its books in one long transaction; here the final DELETE finds no
+    referencing rows. Returns the number of categories deleted (0 or 1).
+    """
+    cur = mysql.connection.cursor()
+    while True:
+        rows = cur.execute("UPDATE books SET category_id = NULL WHERE category_id = %s AND user_id = %s LIMIT %s",
+                           (category_id, user_id, batch_size))
+        mysql.connection.commit()
+        if rows < batch_size:
+            break
+    rows = cur.execute("DELETE FROM categories WHERE id = %s AND user_id = %s AND deleted_at IS NOT NULL",
+                       (category_id, user_id))
+    mysql.connection.commit()
+    cur.close()
+    return rows
+
+def purge_deleted_categories(batch_size=500):
+    """Detach and hard-delete soft-deleted categories. Returns the number purged"""
+    purged = 0
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT id, user_id FROM categories WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT %s",
+                (batch_size,))
+    rows = cur.fetchall()
+    cur.close()
+    for row in rows:
+        if not mysql.is_moving(row['user_id']):
+            purged += detach_category(row['id'], row['user_id'], batch_size)
+    return purged
+
+def sync_changes(user_id, since, limit):
+    """Return up to `limit` of the user's changes after `since` in sequence order, and whether more remain"""
+    cur = mysql.connection.cursor()
+    changes = []
+    cur.execute(f"""
+        SELECT id, title, author, link, isbn, category_id, reading_status, total_pages, current_page,
+               start_date, finish_date, file_name, cover_key, updated_at, deleted_at, change_seq
+        FROM books WHERE user_id = %s AND change_seq > %s {'AND deleted_at IS NULL' if since == 0 else ''}
+        ORDER BY change_seq LIMIT %s
+    """, (user_id, since, limit + 1))
+    changes.extend(('book', row) for row in cur.fetchall())
+    cur.execute(f"""
+        SELECT id, name, deleted_at, change_seq FROM categories
+        WHERE user_id = %s AND change_seq > %s {'AND deleted_at IS NULL' if since == 0 else ''}
+        ORDER BY change_seq LIMIT %s
+    """, (user_id, since, limit + 1))
+    changes.extend(('category', row) for row in cur.fetchall())
+    if since > 0:
+        cur.execute("""
+            SELECT entity, entity_id, seq AS change_seq FROM sync_tombstones
+            WHERE user_id = %s AND seq > %s ORDER BY seq LIMIT %s
+        """, (user_id, since, limit + 1))
+        changes.extend(('tombstone', row) for row in cur.fetchall())
+    cur.close()
+    changes.sort(key=lambda change: change[1]['change_seq'])
+    return changes[:limit], len(changes) > limit
+
+def prune_sync_tombstones(retention_days=90, batch_size=10000):
+    """Delete tombstones older than the retention window in small batches.
+
+    The highest pruned sequence is kept per user, so /sync can tell a client
+    whose cursor predates it to resync from scratch. Returns the number of
+    deleted tombstones.
+    """
+    deleted = 0
+    cur = mysql.connection.cursor()
+    while True:
+        cur.execute("""
+            SELECT user_id, MAX(seq) AS seq FROM (
+                SELECT user_id, seq FROM sync_tombstones
+                WHERE created_at < NOW() - INTERVAL %s DAY ORDER BY created_at LIMIT %s
+            ) old GROUP BY user_id
+        """, (retention_days, batch_size))
+        horizons = [(row['seq'], row['user_id']) for row in cur.fetchall()]
+        if not horizons:
+            break
+        cur.executemany("UPDATE sync_cursors SET pruned_seq = GREATEST(pruned_seq, %s) WHERE user_id = %s", horizons)
+        rows = 0
+        for seq, user_id in horizons:
+            rows += cur.execute("DELETE FROM sync_tombstones WHERE user_id = %s AND seq <= %s", (user_id, seq))
+        mysql.connection.commit()
+        deleted += rows
+        if rows < batch_size:
+            break
+    cur.close()
+    return deleted
+
+def get_library_analytics(user_id):
+    """Analytics for /stats, cached per user until one of their books or categories changes.
+
+    The key carries the user's sync counter, which every book and category
+    write bumps on any worker, so a cache hit costs one primary-key lookup.
+    """
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT seq FROM sync_cursors WHERE user_id = %s", (user_id,))
+    row = cur.fetchone()
+    key = (user_id, row['seq'] if row else 0)
+    summary = analytics_cache.get(key)
+    if summary is None:
+        summary = analytics.library_summary(cur, user_id)
+        analytics_cache.invalidate(user_id)
+        analytics_cache.set(key, summary)
+    cur.close()
+    return summary
+
+_index_builds = ThreadPoolExecutor(max_workers=1, thread_name_prefix='title-index')
+_index_pending = set()
+_index_pending_lock = threading.Lock()
+
+def get_title_index(user_id):
+    """Return the user's duplicate detection index, or None until its first build finishes"""
+    import time
+    entry = title_indexes.get(user_id)
+    if entry is None or time.monotonic() - entry[0] > DEDUPE_INDEX_TTL:
+        schedule_title_index(user_id)
+    return entry[1] if entry else None
+
+def schedule_title_index(user_id):
+    """Queue a background build (or change_seq catch-up) of a user's index, once at a time"""
+    with _index_pending_lock:
+        if user_id in _index_pending:
+            return
+        _index_pending.add(user_id)
+    _index_builds.submit(refresh_title_index, current_app._get_current_object(), user_id)
+
+def refresh_title_index(app, user_id):
+    """Worker task: build the user's index, or apply books changed since its last refresh"""
+    import time
+    try:
+        with app.app_context(), mysql.using(mysql.shard_for(user_id)):
+            entry = title_indexes.get(user_id)
+            index, since = (entry[1], entry[2]) if entry else (TitleIndex(), None)
+            cur = mysql.connection.cursor()
+            if since is None:
+                cur.execute("SELECT id, title, author, deleted_at, change_seq FROM books WHERE user_id = %s AND deleted_at IS NULL",
+                            (user_id,))
+            else:
+                # Sequence numbers become visible in commit order, so nothing below `since` can still appear
+                cur.execute("SELECT id, title, author, deleted_at, change_seq FROM books WHERE user_id = %s AND change_seq > %s",
+                            (user_id, since))
+            since = since or 0
+            for row in cur.fetchall():
+                if row['deleted_at'] is None:
+                    index.add(row['id'], row['title'], row['author'])
+                else:
+                    index.remove(row['id'])
+                since = max(since, row['change_seq'])
+            cur.close()
+            title_indexes.set(user_id, (time.monotonic(), index, since))
+    except Exception as e:
+        print(f"Error indexing titles for user {user_id}: {e}")
+    finally:
+        with _index_pending_lock:
+            _index_pending.discard(user_id)
+
+def cached_title_index(user_id):
+    """Return the user's index only if already built (writes never force a build)"""
+    entry = title_indexes.get(user_id)
+    return entry[1] if entry else None
+
+_enricher_lock = threading.Lock()
+
+def get_enricher():
+    """Build this process's metadata Enricher on first use (None when disabled)"""
+    if 'enricher' not in current_app.extensions:
+        with _enricher_lock:
+            if 'enricher' not in current_app.extensions:
+                provider = make_provider(current_app.config['ENRICHMENT_PROVIDER'])
+                current_app.extensions['enricher'] = provider and Enricher(
+                    provider,
+                    DiskCache(current_app.config['ENRICHMENT_CACHE'], current_app.config['ENRICHMENT_CACHE_TTL']),
+                    max_workers=current_app.config['ENRICHMENT_WORKERS'])
+    return current_app.extensions['enricher']
+
+_thumbnailer_lock = threading.Lock()
+
+def get_thumbnailer():
+    """Build this process's Thumbnailer (and its worker pool) on first use"""
+    if 'thumbnailer' not in current_app.extensions:
+        with _thumbnailer_lock:
+            if 'thumbnailer' not in current_app.extensions:
+                current_app.extensions['thumbnailer'] = thumbnails.Thumbnailer(
+                    current_app.config['THUMBNAIL_FOLDER'],
+                    current_app.config['THUMBNAIL_QUOTA'],
+                    workers=current_app.config['THUMBNAIL_WORKERS'])
+    return current_app.extensions['thumbnailer']
+
+def cover_source(file_name=None, cover_url=None, image=None):
+    """Pick cover bytes: an uploaded image, then the book file's own cover, then the metadata cover URL"""
+    if image:
+        return image
+    if file_name:
+        source = thumbnails.extract_cover(os.path.join(current_app.config['UPLOAD_FOLDER'], file_name))
+        if source:
+            return source
+    if cover_url:
+        try:
+            return thumbnails.download(cover_url)
+        except Exception as e:
+            print(f"Could not download cover {cover_url}: {e}")
+    return None
+
+def generate_cover(app, book_id, user_id, file_name=None, cover_url=None, image=None):
+    """Worker task: derive and store thumbnails, then record the cover key on the book"""
+    with app.app_context():
+        # An uploaded image exists nowhere else, so keep it for regenerating evicted thumbnails
+        key = get_thumbnailer().store(cover_source(file_name, cover_url, image), keep_source=image is not None)
+        if key is None:
+            return
+        if mysql.is_moving(user_id):
+            # The row is being copied to another shard; `flask generate-covers` records it later
+            print(f"Skipped cover for book {book_id}: user {user_id} is being moved")
+            return
+        with mysql.using(mysql.shard_for(user_id)):
+            cur = mysql.connection.cursor()
+            cur.execute("UPDATE books SET cover_key = %s WHERE id = %s AND user_id = %s", (key, book_id, user_id))
+            mysql.connection.commit()
+            cur.close()
+        card_cache.invalidate(book_id)
+
+def schedule_cover(book_id, user_id, file_name=None, cover_url=None, image=None):
+    """Generate thumbnails off the request thread"""
+    if thumbnails.pillow() is None or not (file_name or cover_url or image):
+        return
+    app = current_app._get_current_object()
+    get_thumbnailer().pool.submit(generate_cover, app, book_id, user_id, file_name, cover_url, image)
+
+def books_url(category_id=None, status=None, tag_ids=(), tag_mode='all'):
+    """Build a /books link that keeps the active filters"""
+    params = []
+    if category_id:
+        params.append(('category', category_id))
+    if status:
+        params.append(('status', status))
+    for tag_id in tag_ids:
+        params.append(('tag', tag_id))
+    if tag_ids and tag_mode == 'any':
+        params.append(('tag_mode', 'any'))
+    return '/books?' + urlencode(params) if params else '/books'
+
 def get_all_categories():
     """Fetch all categories for current user"""
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
-        cur.execute("SELECT * FROM categories WHERE user_id = %s ORDER BY name", (user_id,))
+        cur.execute("SELECT * FROM categories WHERE user_id = %s AND deleted_at IS NULL ORDER BY name", (user_id,))
         categories = cur.fetchall()
         cur.close()
         return categories
@@ -155,13 +1263,58 @@ def get_all_categories():
 
 def render_page(title, content):
     """Helper function to render a page with base template"""
-    return render_template('base.html', title=title, content=content)
+    stylesheet = f'<link rel="stylesheet" href="{asset_url("css/books.css")}">'
+    return render_template('base.html', title=title, content=stylesheet + content)
+
+def asset_url(filename):
+    """URL of a static file under its content fingerprint (cacheable forever)"""
+    return '/assets/' + assets.fingerprint(current_app.static_folder, filename)
+
+@bp.route('/assets/<path:name>')
+def serve_asset(name):
+    """Serve fingerprinted static files, preferring a precompressed sibling"""
+    filename = assets.resolve(current_app.static_folder, name)
+    if filename is None:
+        return 'Not found', 404
+    import mimetypes
+    path = os.path.join(current_app.static_folder, filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = assets.pick_encoding(request.headers.get('Accept-Encoding'))
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    sibling = assets.precompressed(path, suffix) if suffix else None
+    if sibling:
+        response = send_file(sibling, mimetype=mimetype, max_age=31536000)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.after_app_request
+def compress_response(response):
+    """Gzip/brotli text responses above COMPRESS_MIN_SIZE"""
+    if (response.direct_passthrough or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(assets.COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = assets.pick_encoding(request.headers.get('Accept-Encoding'))
+    data = response.get_data()
+    if encoding is None or len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.set_data(assets.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 # ============================================================================
 # ROUTES
 # ============================================================================
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', rate=5 / 60, burst=10,
+              when=lambda: request.method == 'POST',
+              key=lambda: f"{request.form.get('username', '').strip().lower()}@{request.remote_addr}")
 def login():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
@@ -172,11 +1325,13 @@ def login():
             return redirect('/login')
         
         try:
-            cur = mysql.connection.cursor()
+            # Usernames are only unique on the directory shard
+            cur = mysql.directory.cursor()
             cur.execute("SELECT * FROM users WHERE username=%s", (username,))
             user = cur.fetchone()
             cur.close()
             
+            from werkzeug.security import check_password_hash
             if user and check_password_hash(user['password_hash'], password):
                 session['user_id'] = user['id']
                 session['username'] = user['username']
@@ -210,7 +1365,41 @@ def login():
     '''
     return render_template_string(render_page('Login - Book Master', content))
 
-@app.route('/register', methods=['GET', 'POST'])
+def create_user(username, password_hash):
+    """Insert a user on the directory, its data shard and its placement row.
+
+    The data shard's copy of the row (for its foreign keys) is committed
+    before the directory row: until the directory commits nobody can log in
+    as the user, and if it fails the copy is removed again. Returns the id.
+    """
+    directory = mysql.directory
+    cur = directory.cursor()
+    shard = None
+    try:
+        cur.execute("INSERT INTO users (username, password_hash) VALUES (%s,%s)", (username, password_hash))
+        user_id = cur.lastrowid
+        shard = mysql.place(user_id)
+        if shard != DIRECTORY:
+            shard_cur = mysql.shard(shard).cursor()
+            shard_cur.execute("INSERT INTO users (id, username, password_hash) VALUES (%s, %s, %s)",
+                              (user_id, username, password_hash))
+            mysql.shard(shard).commit()
+            shard_cur.close()
+        mysql.set_placement(user_id, shard, commit=False)
+        directory.commit()
+        return user_id
+    except Exception:
+        directory.rollback()
+        if shard not in (None, DIRECTORY):
+            shard_cur = mysql.shard(shard).cursor()
+            shard_cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            mysql.shard(shard).commit()
+            shard_cur.close()
+        raise
+    finally:
+        cur.close()
+
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
@@ -225,11 +1414,9 @@ def register():
             return redirect('/register')
         
         try:
+            from werkzeug.security import generate_password_hash
             password_hash = generate_password_hash(password)
-            cur = mysql.connection.cursor()
-            cur.execute("INSERT INTO users (username, password_hash) VALUES (%s,%s)", (username, password_hash))
-            mysql.connection.commit()
-            cur.close()
+            create_user(username, password_hash)
             flash('Registration successful! Please login.', 'success')
             return redirect('/login')
         except Exception as e:
@@ -261,13 +1448,13 @@ def register():
     '''
     return render_template_string(render_page('Register - Book Master', content))
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('You have been logged out', 'success')
     return redirect('/login')
 
-@app.route('/')
+@bp.route('/')
 def index():
     content = '''
     <div style="text-align: center; padding: 40px 0;">
@@ -301,13 +1488,119 @@ def index():
     '''
     return render_template_string(render_page('Home - Book Master', content))
 
-@app.route('/books')
+def render_book_card(book, tags):
+    """Build the HTML card for one book on the listing page"""
+    # Calculate reading progress
+    progress_html = ""
+    if book.get('total_pages') and book.get('total_pages') > 0:
+        current = book.get('current_page', 0)
+        total = book['total_pages']
+        percentage = min(100, int((current / total) * 100))
+        progress_html = f'''
+        <div class="progress">
+            <div class="progress-label">
+                <span>Progress: {current}/{total} pages</span>
+                <span>{percentage}%</span>
+            </div>
+            <div class="progress-track">
+                <div class="progress-fill" style="width: {percentage}%;"></div>
+            </div>
+        </div>
+        '''
+
+    # Status badge
+    status_badges = {
+        'want_to_read': '📖 Not started',
+        'reading': '📗 Reading',
+        'finished': '✅ Finished'
+    }
+    status = book.get('reading_status', 'want_to_read')
+    status_text = status_badges.get(status, '📚 Unknown')
+    status_class = status if status in status_badges else 'unknown'
+    status_badge = f'<span class="badge badge-status badge-{status_class}">{status_text}</span>'
+
+    # Dates display
+    dates_html = ""
+    if book.get('start_date'):
+        dates_html += f'<p class="book-date">Started: {book["start_date"]}</p>'
+    if book.get('finish_date'):
+        dates_html += f'<p class="book-date">Finished: {book["finish_date"]}</p>'
+
+    link_html = ""
+    if book.get('link'):
+        safe_link = book["link"].replace('"', '&quot;')
+        link_html = f'<p class="book-link"><a href="{safe_link}" target="_blank" class="btn btn-filter">📖 View Book</a></p>'
+
+    file_html = ""
+    if book.get('file_name'):
+        file_name = book['file_name']
+        file_ext = file_name.rsplit('.', 1)[1].lower() if '.' in file_name else 'file'
+        file_icon = '📄' if file_ext == 'pdf' else '📝'
+        book_id = book['id']
+        read_html = f' <a href="/read/{book_id}" class="btn btn-filter">📖 Read</a>' if file_ext == 'pdf' else ''
+        file_html = f'<p class="book-link"><a href="/download_file/{book_id}" class="btn btn-filter">{file_icon} Download</a>{read_html}</p>'
+
+    category_badge = ""
+    if book.get('category_name'):
+        category_badge = f'<span class="badge badge-category">📁 {book["category_name"]}</span>'
+
+    tag_badges = ""
+    for tag in tags:
+        tag_badges += f'<span class="badge badge-tag">🏷️ {tag["name"]}</span>'
+
+    author_display = book.get('author') or 'Unknown Author'
+    safe_title = book['title'].replace("'", "\\'").replace('"', '&quot;')
+    safe_author = author_display.replace('"', '&quot;')
+
+    cover_html = ""
+    if book.get('cover_key'):
+        cover = f"/covers/{book['cover_key']}"
+        cover_html = f'''<picture class="book-cover">
+                <source type="image/webp" srcset="{cover}/96.webp, {cover}/200.webp 2x">
+                <img src="{cover}/96.jpeg" srcset="{cover}/200.jpeg 2x" width="96" loading="lazy" alt="">
+            </picture>'''
+
+    return f'''
+    <div class="book-card">
+        <div class="book-info">
+            {cover_html}
+            <input type="checkbox" name="book_ids" value="{book['id']}" form="bulk-form" class="bulk-select">
+            <h3 class="book-title">{safe_title}</h3>
+            <p class="book-author">by {safe_author}</p>
+            {status_badge}
+            {category_badge}
+            {tag_badges}
+            <p class="book-id">ID: {book['id']}</p>
+            {dates_html}
+            {progress_html}
+            {link_html}
+            {file_html}
+        </div>
+
+        <div class="book-actions">
+            <a href="/update_progress/{book['id']}" class="btn btn-progress">📊 Progress</a>
+            <a href="/edit_book/{book['id']}" class="btn btn-secondary">Edit</a>
+            <form action="/delete_book/{book['id']}" method="post" 
+                  onsubmit="return confirmDelete('{safe_title}');" 
+                  class="inline-form">
+                <button type="submit" class="btn btn-danger">Delete</button>
+            </form>
+        </div>
+    </div>
+    '''
+
+@bp.route('/books')
 @login_required
+@rate_limited('search', rate=2, burst=20, concurrency=8, queue=16,
+              when=lambda: bool(request.args.get('q')))
 def display_books():
     category_id = request.args.get('category')
     status_filter = request.args.get('status')
-    books = get_all_books(category_id=category_id if category_id else None)
+    tag_ids = parse_ids(request.args.getlist('tag'))
+    tag_mode = 'any' if request.args.get('tag_mode') == 'any' else 'all'
+    books = get_all_books(category_id=category_id if category_id else None, tag_ids=tag_ids, tag_mode=tag_mode)
     categories = get_all_categories()
+    tags = get_tag_counts()
     search_query = request.args.get('q', '')
     
     # Apply status filter
@@ -320,8 +1613,8 @@ def display_books():
             user_id = session.get('user_id')
             query = """SELECT b.*, c.name as category_name 
                        FROM books b 
-                       LEFT JOIN categories c ON b.category_id = c.id 
-                       WHERE b.user_id = %s AND (b.title LIKE %s OR b.author LIKE %s)"""
+                       LEFT JOIN categories c ON b.category_id = c.id AND c.deleted_at IS NULL
+                       WHERE b.user_id = %s AND b.deleted_at IS NULL AND (b.title LIKE %s OR b.author LIKE %s)"""
             params = [user_id, f'%{search_query}%', f'%{search_query}%']
             
             if category_id:
@@ -330,6 +1623,9 @@ def display_books():
             if status_filter:
                 query += " AND b.reading_status = %s"
                 params.append(status_filter)
+            tag_sql, tag_params = tag_filter_clause(tag_ids, tag_mode)
+            query += tag_sql
+            params.extend(tag_params)
             
             query += " ORDER BY b.id"
             cur.execute(query, params)
@@ -339,7 +1635,7 @@ def display_books():
             print(f"Error searching books: {e}")
     
     # Build status filter buttons
-    status_filter_html = '<div style="display: flex; gap: 10px; flex-wrap: wrap; margin-bottom: 15px;">'
+    status_filter_html = '<div class="filter-bar">'
     status_options = [
         ('', 'All Status', '📚'),
         ('want_to_read', 'Not started', '📖'),
@@ -349,102 +1645,64 @@ def display_books():
     for val, label, icon in status_options:
         active = '' if status_filter != val else ''
         btn_class = 'btn-secondary' if status_filter != val else 'btn'
-        status_filter_html += f'<a href="/books?{"category=" + category_id + "&" if category_id else ""}status={val}" class="btn {btn_class}" style="padding: 8px 16px; font-size: 14px;">{icon} {label}</a>'
+        status_filter_html += f'<a href="{books_url(category_id, val, tag_ids, tag_mode)}" class="btn {btn_class} btn-filter">{icon} {label}</a>'
     status_filter_html += '</div>'
     
     # Build category filter buttons
-    category_filter = '<div style="display: flex; gap: 10px; flex-wrap: wrap; margin-bottom: 20px;">'
-    category_filter += f'<a href="/books?{"status=" + status_filter if status_filter else ""}" class="btn {"" if not category_id else "btn-secondary"}" style="padding: 8px 16px;">All Books</a>'
+    category_filter = '<div class="filter-bar filter-bar-spaced">'
+    category_filter += f'<a href="{books_url(None, status_filter, tag_ids, tag_mode)}" class="btn {"" if not category_id else "btn-secondary"} btn-filter">All Books</a>'
     for cat in categories:
         btn_class = "btn-secondary" if str(cat['id']) != category_id else "btn"
-        category_filter += f'<a href="/books?category={cat["id"]}{"&status=" + status_filter if status_filter else ""}" class="btn {btn_class}" style="padding: 8px 16px;">{cat["name"]}</a>'
+        category_filter += f'<a href="{books_url(cat["id"], status_filter, tag_ids, tag_mode)}" class="btn {btn_class} btn-filter">{cat["name"]}</a>'
     category_filter += '</div>'
     
+    # Build tag filter buttons (click toggles a tag, counts come from one grouped query)
+    tag_filter = ""
+    if tags:
+        tag_filter = '<div class="tag-bar">'
+        for tag in tags:
+            selected = tag['id'] in tag_ids
+            toggled = [t for t in tag_ids if t != tag['id']] if selected else sorted(tag_ids + [tag['id']])
+            btn_class = "btn" if selected else "btn-secondary"
+            tag_filter += f'<a href="{books_url(category_id, status_filter, toggled, tag_mode)}" class="btn {btn_class} btn-tag">🏷️ {tag["name"]} ({tag["count"]})</a>'
+        if len(tag_ids) > 1:
+            other_mode = 'any' if tag_mode == 'all' else 'all'
+            mode_label = 'Match any tag' if tag_mode == 'all' else 'Match all tags'
+            tag_filter += f'<a href="{books_url(category_id, status_filter, tag_ids, other_mode)}" class="link-small">{mode_label}</a>'
+        tag_filter += '</div>'
+    
+    book_tags = get_book_tags([book['id'] for book in books])
+    
     books_html = ""
     if books:
-        books_html = '<div style="display: grid; gap: 20px;">'
+        bulk_category_options = '<option value="">No Category</option>' + ''.join(
+            f'<option value="{cat["id"]}">{cat["name"]}</option>' for cat in categories)
+        books_html = f'''
+        <form id="bulk-form" action="/bulk_edit" method="post" class="bulk-bar">
+            <label class="bulk-label">
+                <input type="checkbox" onclick="document.querySelectorAll('.bulk-select').forEach(c => c.checked = this.checked)">
+                Select all
+            </label>
+            <select name="category_id" class="bulk-input">{bulk_category_options}</select>
+            <button type="submit" name="action" value="category" class="btn btn-secondary btn-filter">Set category</button>
+            <select name="reading_status" class="bulk-input">
+                <option value="want_to_read">📖 Not started</option>
+                <option value="reading">📗 Reading</option>
+                <option value="finished">✅ Finished</option>
+            </select>
+            <button type="submit" name="action" value="status" class="btn btn-secondary btn-filter">Set status</button>
+            <input type="text" name="tags" placeholder="tag, another tag" class="bulk-input">
+            <button type="submit" name="action" value="tags" class="btn btn-secondary btn-filter">Add tags</button>
+            <button type="submit" name="action" value="delete" class="btn btn-danger btn-filter"
+                    onclick="return confirm('Delete the selected books?');">Delete selected</button>
+        </form>
+        <div class="book-grid">'''
         for book in books:
-            # Calculate reading progress
-            progress_html = ""
-            if book.get('total_pages') and book.get('total_pages') > 0:
-                current = book.get('current_page', 0)
-                total = book['total_pages']
-                percentage = min(100, int((current / total) * 100))
-                progress_html = f'''
-                <div style="margin-top: 10px;">
-                    <div style="display: flex; justify-content: space-between; font-size: 12px; color: #94a3b8; margin-bottom: 4px;">
-                        <span>Progress: {current}/{total} pages</span>
-                        <span>{percentage}%</span>
-                    </div>
-                    <div style="background: #334155; height: 8px; border-radius: 4px; overflow: hidden;">
-                        <div style="background: #0ea5e9; height: 100%; width: {percentage}%; transition: width 0.3s ease;"></div>
-                    </div>
-                </div>
-                '''
-            
-            # Status badge
-            status_badges = {
-                'want_to_read': ('📖 Not started', '#6366f1'),
-                'reading': ('📗 Reading', '#22c55e'),
-                'finished': ('✅ Finished', '#10b981')
-            }
-            status = book.get('reading_status', 'want_to_read')
-            status_text, status_color = status_badges.get(status, ('📚 Unknown', '#64748b'))
-            status_badge = f'<span style="display: inline-block; background: {status_color}; color: white; padding: 4px 12px; border-radius: 12px; font-size: 12px; margin-top: 5px; margin-right: 8px;">{status_text}</span>'
-            
-            # Dates display
-            dates_html = ""
-            if book.get('start_date'):
-                dates_html += f'<p style="font-size: 13px; color: #94a3b8; margin-top: 5px;">Started: {book["start_date"]}</p>'
-            if book.get('finish_date'):
-                dates_html += f'<p style="font-size: 13px; color: #94a3b8; margin-top: 2px;">Finished: {book["finish_date"]}</p>'
-            
-            link_html = ""
-            if book.get('link'):
-                safe_link = book["link"].replace('"', '&quot;')
-                link_html = f'<p style="margin-top: 8px;"><a href="{safe_link}" target="_blank" class="btn" style="padding: 8px 16px; font-size: 14px;">📖 View Book</a></p>'
-            
-            file_html = ""
-            if book.get('file_name'):
-                file_name = book['file_name']
-                file_ext = file_name.rsplit('.', 1)[1].lower() if '.' in file_name else 'file'
-                file_icon = '📄' if file_ext == 'pdf' else '📝'
-                book_id = book['id']
-                file_html = f'<p style="margin-top: 8px;"><a href="/download_file/{book_id}" class="btn" style="padding: 8px 16px; font-size: 14px;">{file_icon} Download</a></p>'
-            
-            category_badge = ""
-            if book.get('category_name'):
-                category_badge = f'<span style="display: inline-block; background: #0ea5e9; color: white; padding: 4px 12px; border-radius: 12px; font-size: 12px; margin-top: 5px;">📁 {book["category_name"]}</span>'
-            
-            author_display = book.get('author') or 'Unknown Author'
-            safe_title = book['title'].replace("'", "\\'").replace('"', '&quot;')
-            safe_author = author_display.replace('"', '&quot;')
-            
-            books_html += f'''
-            <div class="book-card">
-                <div class="book-info">
-                    <h3 class="book-title">{safe_title}</h3>
-                    <p class="book-author">by {safe_author}</p>
-                    {status_badge}
-                    {category_badge}
-                    <p class="book-id">ID: {book['id']}</p>
-                    {dates_html}
-                    {progress_html}
-                    {link_html}
-                    {file_html}
-                </div>
-                
-                <div class="book-actions">
-                    <a href="/update_progress/{book['id']}" class="btn" style="background: #22c55e;">📊 Progress</a>
-                    <a href="/edit_book/{book['id']}" class="btn btn-secondary">Edit</a>
-                    <form action="/delete_book/{book['id']}" method="post" 
-                          onsubmit="return confirmDelete('{safe_title}');" 
-                          style="margin: 0;">
-                        <button type="submit" class="btn btn-danger">Delete</button>
-                    </form>
-                </div>
-            </div>
-            '''
+            tags = book_tags.get(book['id'], [])
+            # Cards are cached per row version; tag names join the key because
+            # tag edits do not touch the book row
+            key = (book['id'], book.get('updated_at'), book.get('category_name'), tuple(tag['name'] for tag in tags))
+            books_html += card_cache.get_or_set(key, lambda: render_book_card(book, tags))
         books_html += '</div>'
         books_html += f'<div class="stats">Total: {len(books)} book(s)</div>'
     else:
@@ -475,17 +1733,21 @@ def display_books():
         <h2 class="page-title">{title_text}</h2>
         <div class="header-actions">
             <a href="/add_book" class="btn">+ Add New Book</a>
+            <a href="/duplicates" class="btn btn-secondary">Duplicates</a>
         </div>
     </div>
 
     {status_filter_html}
     {category_filter}
+    {tag_filter}
 
     <form action="/books" method="get" class="search-container" style="max-width: 100%;">
         <input type="search" name="q" placeholder="Search by title or author..." 
                value="{search_query}">
         {f'<input type="hidden" name="category" value="{category_id}">' if category_id else ''}
         {f'<input type="hidden" name="status" value="{status_filter}">' if status_filter else ''}
+        {''.join(f'<input type="hidden" name="tag" value="{tag_id}">' for tag_id in tag_ids)}
+        {'<input type="hidden" name="tag_mode" value="any">' if tag_ids and tag_mode == 'any' else ''}
         <button type="submit" class="btn">Search</button>
         {clear_button}
     </form>
@@ -494,8 +1756,10 @@ def display_books():
     '''
     return render_template_string(render_page('All Books - Book Master', content))
 
-@app.route('/add_book', methods=['GET', 'POST'])
+@bp.route('/add_book', methods=['GET', 'POST'])
 @login_required
+@rate_limited('upload', rate=10 / 60, burst=10, concurrency=4, queue=8, queue_timeout=10,
+              when=lambda: request.method == 'POST')
 def add_book():
     if request.method == 'POST':
         title = request.form.get('title', '').strip()
@@ -504,35 +1768,69 @@ def add_book():
         category_id = request.form.get('category_id', '').strip()
         reading_status = 'want_to_read'  # Always set to not started for new books
         total_pages = request.form.get('total_pages', '').strip()
+        tag_names = parse_tag_names(request.form.get('tags', ''))
+        isbn_input = request.form.get('isbn', '').strip()
+        isbn = normalize_isbn(isbn_input)
+        cover_url = None
         file_name = None
         
-        if not title:
+        # Fill whatever was left blank from the ISBN's metadata
+        if isbn and get_enricher():
+            metadata = get_enricher().lookup(isbn) or {}
+            title = title or (metadata.get('title') or '')[:200]
+            author = author or (metadata.get('author') or '')[:100]
+            total_pages = total_pages or str(metadata.get('total_pages') or '')
+            cover_url = metadata.get('cover_url')
+        
+        if isbn_input and not isbn:
+            flash('ISBN is not valid', 'error')
+        elif not title:
             flash('Book title is required', 'error')
         else:
             try:
                 if 'file' in request.files:
                     file = request.files['file']
                     if file and file.filename and allowed_file(file.filename):
+                        from werkzeug.utils import secure_filename
                         filename = secure_filename(file.filename)
                         import time
                         timestamp = int(time.time())
                         filename = f"{timestamp}_{filename}"
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                        # Create upload folder on first upload rather than at import
+                        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+                        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                         file.save(file_path)
                         file_name = filename
                 
-                cur = mysql.connection.cursor()
+                cover_image = None
+                cover_file = request.files.get('cover')
+                if cover_file and cover_file.filename:
+                    cover_image = cover_file.read(thumbnails.MAX_SOURCE_BYTES)
+                
                 user_id = session.get('user_id')
+                index = get_title_index(user_id)
+                # While the index is first being built the duplicate warning is skipped
+                duplicates = index.matches(title, author) if index is not None else []
+                
+                cur = mysql.connection.cursor()
                 cur.execute("""INSERT INTO books 
-                    (title, author, link, file_name, category_id, user_id, reading_status, total_pages) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""", 
+                    (title, author, link, file_name, category_id, user_id, reading_status, total_pages, isbn, cover_url) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""", 
                     (title, author if author else None, link if link else None, file_name, 
                      category_id if category_id else None, user_id, reading_status,
-                     int(total_pages) if total_pages else None))
+                     int(total_pages) if total_pages else None, isbn, cover_url))
+                new_id = cur.lastrowid
+                set_book_tags(cur, new_id, user_id, tag_names)
                 mysql.connection.commit()
                 cur.close()
+                if index is not None:
+                    index.add(new_id, title, author)
+                schedule_cover(new_id, user_id, file_name, cover_url, cover_image)
                 
                 flash(f'Book "{title}" added successfully!', 'success')
+                if duplicates:
+                    similar = ', '.join(f'"{m[1]}" (ID {m[0]})' for m in duplicates[:3])
+                    flash(f'Possible duplicate of {similar}. Review it under Duplicates.', 'warning')
                 return redirect('/books')
             except Exception as e:
                 flash(f'Error adding book: {str(e)}', 'error')
@@ -540,7 +1838,7 @@ def add_book():
     content = get_add_book_form()
     return render_template_string(render_page('Add Book - Book Master', content))
 
-def get_add_book_form(title='', author='', link='', category_id='', total_pages=''):
+def get_add_book_form(title='', author='', link='', category_id='', total_pages='', tags=''):
     categories = get_all_categories()
     category_options = '<option value="">No Category</option>'
     for cat in categories:
@@ -550,16 +1848,27 @@ def get_add_book_form(title='', author='', link='', category_id='', total_pages=
     safe_title = title.replace('"', '"')
     safe_author = author.replace('"', '"')
     safe_link = link.replace('"', '"')
+    safe_tags = tags.replace('"', '&quot;')
 
     return f'''
     <div style="max-width: 600px; margin: 0 auto;">
         <h2 class="page-title" style="margin-bottom: 30px;">Add New Book</h2>
 
         <form action="/add_book" method="post" enctype="multipart/form-data" onsubmit="return validateBookForm(event)">
+            <div class="form-group">
+                <label for="isbn">ISBN (Optional)</label>
+                <input type="text" id="isbn" name="isbn"
+                       placeholder="ISBN-10 or ISBN-13" maxlength="17">
+                <small style="color: #94a3b8; margin-top: 5px; display: block;">
+                    Title, author and page count are filled in from the ISBN when left blank.
+                    <a href="/import_isbns" style="color: #0ea5e9;">Import many ISBNs</a>
+                </small>
+            </div>
+
             <div class="form-group">
                 <label for="title">Book Title *</label>
-                <input type="text" id="title" name="title" required
-                       value="{safe_title}" placeholder="Enter book title" maxlength="200">
+                <input type="text" id="title" name="title"
+                       value="{safe_title}" placeholder="Enter book title (or leave blank to use the ISBN)" maxlength="200">
             </div>
 
             <div class="form-group">
@@ -578,6 +1887,13 @@ def get_add_book_form(title='', author='', link='', category_id='', total_pages=
                 </small>
             </div>
 
+            <div class="form-group">
+                <label for="tags">Tags (Optional)</label>
+                <input type="text" id="tags" name="tags"
+                       value="{safe_tags}" placeholder="e.g., classic, sci-fi, to-lend">
+                <small style="color: #94a3b8; margin-top: 5px; display: block;">Separate tags with commas</small>
+            </div>
+
             <div class="form-group">
                 <label for="total_pages">Total Pages (Optional)</label>
                 <input type="number" id="total_pages" name="total_pages" min="1"
@@ -601,6 +1917,14 @@ def get_add_book_form(title='', author='', link='', category_id='', total_pages=
                 </small>
             </div>
 
+            <div class="form-group">
+                <label for="cover">Cover Image (Optional)</label>
+                <input type="file" id="cover" name="cover" accept="image/*">
+                <small style="color: #94a3b8; margin-top: 5px; display: block;">
+                    Without one, the cover is taken from the attached PDF/EPUB/CBZ or the ISBN lookup
+                </small>
+            </div>
+
             <div style="display: flex; gap: 10px; margin-top: 30px;">
                 <button type="submit" class="btn">Add Book</button>
                 <a href="/books" class="btn btn-secondary">Cancel</a>
@@ -609,7 +1933,96 @@ def get_add_book_form(title='', author='', link='', category_id='', total_pages=
     </div>
     '''
 
-@app.route('/edit_book/<int:book_id>', methods=['GET', 'POST'])
+def import_isbns_job(app, user_id, isbns, batch_size=500):
+    """Worker task: look ISBNs up batch by batch and add the ones found to the user's library.
+
+    Each batch is committed on its own, so books appear while a large import
+    is still running and a failed batch does not lose the others.
+    """
+    with app.app_context():
+        enricher = get_enricher()
+        imported = 0
+        for start in range(0, len(isbns), batch_size):
+            chunk = isbns[start:start + batch_size]
+            try:
+                found = enricher.lookup_many(chunk)
+                if not found:
+                    continue
+                if mysql.is_moving(user_id):
+                    print(f"Stopped ISBN import for user {user_id}: account is being moved")
+                    break
+                with mysql.using(mysql.shard_for(user_id)):
+                    cur = mysql.connection.cursor()
+                    # Skip ISBNs already in the library
+                    cur.execute(f"SELECT isbn FROM books WHERE user_id = %s AND deleted_at IS NULL AND isbn IN ({', '.join(['%s'] * len(found))})",
+                                [user_id] + list(found))
+                    existing = {row['isbn'] for row in cur.fetchall()}
+                    rows = [((data.get('title') or isbn)[:200], (data.get('author') or None) and data['author'][:100],
+                             user_id, data.get('total_pages'), isbn, data.get('cover_url'))
+                            for isbn, data in found.items() if isbn not in existing]
+                    if rows:
+                        cur.executemany("""INSERT INTO books (title, author, user_id, total_pages, isbn, cover_url)
+                                           VALUES (%s, %s, %s, %s, %s, %s)""", rows)
+                        mysql.connection.commit()
+                        with_covers = [row[4] for row in rows if row[5]]
+                        if with_covers:
+                            cur.execute(f"SELECT id, cover_url FROM books WHERE user_id = %s AND deleted_at IS NULL AND isbn IN ({', '.join(['%s'] * len(with_covers))})",
+                                        [user_id] + with_covers)
+                            for book in cur.fetchall():
+                                schedule_cover(book['id'], user_id, cover_url=book['cover_url'])
+                    cur.close()
+                imported += len(rows)
+            except Exception as e:
+                print(f"Error importing ISBNs for user {user_id}: {e}")
+        if imported and title_indexes.get(user_id):
+            schedule_title_index(user_id)
+
+@bp.route('/import_isbns', methods=['GET', 'POST'])
+@login_required
+@rate_limited('import', rate=1 / 60, burst=3, concurrency=2, queue=2,
+              when=lambda: request.method == 'POST')
+def import_isbns():
+    if request.method == 'POST':
+        lines = request.form.get('isbns', '').replace(',', '\n').split()
+        isbns = list(dict.fromkeys(i for i in (normalize_isbn(line) for line in lines) if i))
+        invalid = len(lines) - len(isbns)
+        enricher = get_enricher()
+        
+        if not isbns:
+            flash('No valid ISBNs found', 'error')
+        elif len(isbns) > 10000:
+            flash('Import at most 10,000 ISBNs at a time', 'error')
+        elif enricher is None:
+            flash('Metadata lookups are disabled', 'error')
+        else:
+            app = current_app._get_current_object()
+            enricher.jobs.submit(import_isbns_job, app, session.get('user_id'), isbns)
+            flash(f'Importing {len(isbns)} ISBN(s) in the background; books appear in your library as they are '
+                  f'found{f" ({invalid} invalid skipped)" if invalid else ""}.', 'success')
+            return redirect('/books')
+    
+    content = '''
+    <div style="max-width: 600px; margin: 0 auto;">
+        <h2 class="page-title" style="margin-bottom: 30px;">Import by ISBN</h2>
+        <form action="/import_isbns" method="post">
+            <div class="form-group">
+                <label for="isbns">ISBNs</label>
+                <textarea id="isbns" name="isbns" rows="12" placeholder="One ISBN per line"
+                          style="width: 100%; padding: 12px 15px; border: 2px solid #334155; border-radius: 8px; font-size: 16px; background: #0f172a; color: #e2e8f0;"></textarea>
+                <small style="color: #94a3b8; margin-top: 5px; display: block;">
+                    Title, author, page count and cover are looked up for each ISBN in the background. Up to 10,000 at a time.
+                </small>
+            </div>
+            <div style="display: flex; gap: 10px; margin-top: 30px;">
+                <button type="submit" class="btn">Import</button>
+                <a href="/books" class="btn btn-secondary">Cancel</a>
+            </div>
+        </form>
+    </div>
+    '''
+    return render_template_string(render_page('Import Books - Book Master', content))
+
+@bp.route('/edit_book/<int:book_id>', methods=['GET', 'POST'])
 @login_required
 def edit_book(book_id):
     if request.method == 'POST':
@@ -617,6 +2030,7 @@ def edit_book(book_id):
         author = request.form.get('author', '').strip()
         link = request.form.get('link', '').strip()
         category_id = request.form.get('category_id', '').strip()
+        tag_names = parse_tag_names(request.form.get('tags', ''))
         
         if not title:
             flash('Book title is required', 'error')
@@ -626,11 +2040,17 @@ def edit_book(book_id):
             cur = mysql.connection.cursor()
             user_id = session.get('user_id')
             rows = cur.execute(
-                "UPDATE books SET title = %s, author = %s, link = %s, category_id = %s WHERE id = %s AND user_id = %s",
+                "UPDATE books SET title = %s, author = %s, link = %s, category_id = %s, updated_at = CURRENT_TIMESTAMP(6) WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
                 (title, author if author else None, link if link else None, category_id if category_id else None, book_id, user_id)
             )
+            if rows > 0:
+                set_book_tags(cur, book_id, user_id, tag_names)
             mysql.connection.commit()
             cur.close()
+            card_cache.invalidate(book_id)
+            index = cached_title_index(user_id)
+            if index is not None and rows > 0:
+                index.add(book_id, title, author)
             
             if rows > 0:
                 flash('Book updated successfully!', 'success')
@@ -645,7 +2065,7 @@ def edit_book(book_id):
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
-        cur.execute("SELECT * FROM books WHERE id = %s AND user_id = %s", (book_id, user_id))
+        cur.execute("SELECT * FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL", (book_id, user_id))
         book = cur.fetchone()
         cur.close()
         
@@ -664,6 +2084,8 @@ def edit_book(book_id):
         safe_title = book['title'].replace('"', '&quot;')
         safe_author = book_author.replace('"', '&quot;')
         safe_link = book_link.replace('"', '&quot;')
+        tag_text = ', '.join(tag['name'] for tag in get_book_tags([book['id']]).get(book['id'], []))
+        safe_tags = tag_text.replace('"', '&quot;')
         
         content = f'''
         <div style="max-width: 600px; margin: 0 auto;">
@@ -689,6 +2111,13 @@ def edit_book(book_id):
                     </select>
                 </div>
                 
+                <div class="form-group">
+                    <label for="tags">Tags (Optional)</label>
+                    <input type="text" id="tags" name="tags" 
+                           value="{safe_tags}" placeholder="e.g., classic, sci-fi, to-lend">
+                    <small style="color: #94a3b8; margin-top: 5px; display: block;">Separate tags with commas</small>
+                </div>
+                
                 <div class="form-group">
                     <label for="link">Book Link (Optional)</label>
                     <input type="text" id="link" name="link" 
@@ -708,13 +2137,179 @@ def edit_book(book_id):
         flash(f'Error fetching book: {str(e)}', 'error')
         return redirect('/books')
 
-@app.route('/download_file/<int:book_id>')
+@bp.route('/stream/<int:book_id>')
+@login_required
+def stream_file(book_id):
+    """Serve an uploaded file with byte-range support so viewers fetch only what they show"""
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT file_name FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+                (book_id, session.get('user_id')))
+    book = cur.fetchone()
+    cur.close()
+    if not book or not book.get('file_name'):
+        return 'File not found', 404
+    
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], book['file_name'])
+    try:
+        handle = file_handles.acquire(path)
+    except FileNotFoundError:
+        return 'File no longer exists', 404
+    
+    size = handle['size']
+    etag = f'"{handle["ino"]:x}-{int(handle["mtime"] * 1000):x}-{size:x}"'
+    headers = {'Accept-Ranges': 'bytes', 'ETag': etag, 'Cache-Control': 'private, max-age=3600'}
+    byte_range = request.range
+    if byte_range is None and request.headers.get('If-None-Match') == etag:
+        file_handles.release(handle)
+        return '', 304, headers
+    
+    # A range is only valid for the version the client already holds
+    if byte_range is not None and 'If-Range' in request.headers and request.headers['If-Range'] != etag:
+        byte_range = None
+    # Multipart ranges are not served; the whole file is a valid answer to them
+    if byte_range is not None and len(byte_range.ranges) > 1:
+        byte_range = None
+    
+    start, end, status = 0, size, 200
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            file_handles.release(handle)
+            return '', 416, {'Content-Range': f'bytes */{size}'}
+        start, end = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    headers['Content-Length'] = str(end - start)
+    
+    def generate():
+        # pread never moves a shared file position, so concurrent ranges need no lock
+        offset = start
+        while offset < end:
+            chunk = os.pread(handle['fd'], min(65536, end - offset), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+    
+    import mimetypes
+    mimetype = mimetypes.guess_type(book['file_name'])[0] or 'application/octet-stream'
+    response = Response(generate(), status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+    # The server closes every response, also when the body is never iterated
+    # (HEAD, early disconnect), which an unstarted generator's finally would miss
+    response.call_on_close(lambda: file_handles.release(handle))
+    return response
+
+@bp.route('/read/<int:book_id>')
+@login_required
+def read_book(book_id):
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT id, title, file_name, current_page FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL",
+                    (book_id, session.get('user_id')))
+        book = cur.fetchone()
+        cur.close()
+    except Exception as e:
+        flash(f'Error opening book: {str(e)}', 'error')
+        return redirect('/books')
+    
+    if not book or not (book.get('file_name') or '').lower().endswith('.pdf'):
+        flash('Only uploaded PDFs can be read in the browser', 'error')
+        return redirect('/books')
+    
+    if not assets.vendored_present(current_app.static_folder):
+        flash('The PDF reader is not installed on this server (run "flask vendor-assets")', 'error')
+        return redirect('/books')
+    
+    safe_title = book['title'].replace('"', '&quot;')
+    start_page = max(1, book.get('current_page') or 1)
+    
+    # PDF.js fetches the document lazily in 64KB ranges from /stream
+    content = f'''
+    <div class="page-header">
+        <h2 class="page-title">{safe_title}</h2>
+        <div class="header-actions">
+            <button id="prev" class="btn btn-secondary">◀ Prev</button>
+            <span class="book-author" style="align-self: center;">Page <span id="page-num">{start_page}</span> / <span id="page-count">?</span></span>
+            <button id="next" class="btn btn-secondary">Next ▶</button>
+            <a href="/books" class="btn btn-secondary">Close</a>
+        </div>
+    </div>
+    <div style="text-align: center;">
+        <canvas id="reader-canvas" style="max-width: 100%; background: white;"></canvas>
+    </div>
+    <script type="module">
+        import * as pdfjsLib from '{asset_url("vendor/pdfjs/pdf.min.mjs")}';
+        pdfjsLib.GlobalWorkerOptions.workerSrc = '{asset_url("vendor/pdfjs/pdf.worker.min.mjs")}';
+        
+        const pdf = await pdfjsLib.getDocument({{
+            url: '/stream/{book_id}', disableAutoFetch: true, disableStream: true, rangeChunkSize: 65536
+        }}).promise;
+        const canvas = document.getElementById('reader-canvas');
+        let current = Math.min({start_page}, pdf.numPages);
+        let saveTimer = null;
+        document.getElementById('page-count').textContent = pdf.numPages;
+        
+        async function show(number) {{
+            current = Math.min(Math.max(number, 1), pdf.numPages);
+            const page = await pdf.getPage(current);
+            const viewport = page.getViewport({{ scale: 1.5 }});
+            canvas.width = viewport.width;
+            canvas.height = viewport.height;
+            await page.render({{ canvasContext: canvas.getContext('2d'), viewport }}).promise;
+            document.getElementById('page-num').textContent = current;
+            clearTimeout(saveTimer);
+            saveTimer = setTimeout(() => fetch('/reading_position/{book_id}', {{
+                method: 'POST',
+                body: new URLSearchParams({{ page: current, total_pages: pdf.numPages }})
+            }}), 1500);
+        }}
+        
+        document.getElementById('prev').onclick = () => show(current - 1);
+        document.getElementById('next').onclick = () => show(current + 1);
+        document.addEventListener('keydown', (e) => {{
+            if (e.key === 'ArrowLeft') show(current - 1);
+            if (e.key === 'ArrowRight') show(current + 1);
+        }});
+        show(current);
+    </script>
+    '''
+    return render_template_string(render_page(f'{safe_title} - Book Master', content))
+
+@bp.route('/reading_position/<int:book_id>', methods=['POST'])
+@login_required
+def reading_position(book_id):
+    """Record the page the reader is on (called by /read, debounced)"""
+    page = request.form.get('page', type=int)
+    total_pages = request.form.get('total_pages', type=int)
+    if not page or page < 0:
+        return jsonify(ok=False), 400
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        record_reading_event(cur, book_id, user_id, page)
+        rows = cur.execute("""
+            UPDATE books SET
+                current_page = %s,
+                total_pages = COALESCE(total_pages, %s),
+                reading_status = IF(reading_status = 'want_to_read', 'reading', reading_status),
+                start_date = COALESCE(start_date, CURDATE())
+            WHERE id = %s AND user_id = %s AND deleted_at IS NULL
+        """, (page, total_pages, book_id, user_id))
+        mysql.connection.commit()
+        cur.close()
+        card_cache.invalidate(book_id)
+        return jsonify(ok=rows > 0)
+    except Exception as e:
+        print(f"Error saving reading position: {e}")
+        return jsonify(ok=False), 500
+
+@bp.route('/download_file/<int:book_id>')
 @login_required
 def download_file(book_id):
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
-        cur.execute("SELECT file_name FROM books WHERE id = %s AND user_id = %s", (book_id, user_id))
+        cur.execute("SELECT file_name FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL", (book_id, user_id))
         book = cur.fetchone()
         cur.close()
         
@@ -722,7 +2317,7 @@ def download_file(book_id):
             flash('File not found!', 'error')
             return redirect('/books')
         
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], book['file_name'])
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], book['file_name'])
         
         if not os.path.exists(file_path):
             flash('File no longer exists!', 'error')
@@ -733,28 +2328,41 @@ def download_file(book_id):
         flash(f'Error downloading file: {str(e)}', 'error')
         return redirect('/books')
 
-@app.route('/delete_book/<int:book_id>', methods=['POST'])
+@bp.route('/covers/<key>/<name>')
 @login_required
-def delete_book(book_id):
-    try:
+def serve_cover(key, name):
+    """Serve a thumbnail, regenerating it from the book's source if it was evicted"""
+    width, _, fmt = name.partition('.')
+    if (len(key) != 64 or any(c not in '0123456789abcdef' for c in key)
+            or not width.isdigit() or int(width) not in thumbnails.SIZES or fmt not in thumbnails.FORMATS):
+        return 'Not found', 404
+    thumbnailer = get_thumbnailer()
+    path = thumbnailer.path(key, int(width), fmt)
+    
+    if not os.path.exists(path):
         cur = mysql.connection.cursor()
-        user_id = session.get('user_id')
-        cur.execute("SELECT file_name FROM books WHERE id = %s AND user_id = %s", (book_id, user_id))
+        cur.execute("SELECT file_name, cover_url FROM books WHERE user_id = %s AND cover_key = %s AND deleted_at IS NULL LIMIT 1",
+                    (session.get('user_id'), key))
         book = cur.fetchone()
-        
-        rows = cur.execute("DELETE FROM books WHERE id = %s AND user_id = %s", (book_id, user_id))
-        mysql.connection.commit()
         cur.close()
-        
-        if book and book.get('file_name'):
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], book['file_name'])
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as fe:
-                    print(f"Warning: Could not delete file: {fe}")
-        
-        if rows > 0:
+        if not book:
+            return 'Not found', 404
+        # Only the source that hashed to this key may fill it
+        source = thumbnailer.load_source(key) or cover_source(book['file_name'], book['cover_url'])
+        if thumbnailer.store(source) != key:
+            return 'Not found', 404
+    
+    thumbnailer.touch(path)
+    response = send_file(os.path.abspath(path), mimetype=f'image/{fmt}', max_age=31536000)
+    # Covers belong to a signed-in user's library: browsers may keep them, shared caches may not
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@bp.route('/delete_book/<int:book_id>', methods=['POST'])
+@login_required
+def delete_book(book_id):
+    try:
+        if soft_delete_books(session.get('user_id'), [book_id]) > 0:
             flash('Book deleted successfully!', 'success')
         else:
             flash('Book not found', 'error')
@@ -763,24 +2371,211 @@ def delete_book(book_id):
     
     return redirect('/books')
 
-@app.route('/categories')
+@bp.route('/bulk_edit', methods=['POST'])
+@login_required
+def bulk_edit():
+    """Apply one action (category, status, tags or delete) to every book selected on the listing page"""
+    book_ids = parse_ids(request.form.getlist('book_ids'))
+    action = request.form.get('action')
+    if not book_ids:
+        flash('Select at least one book', 'error')
+        return redirect('/books')
+    
+    try:
+        user_id = session.get('user_id')
+        if action == 'category':
+            category_id = request.form.get('category_id', '').strip()
+            category = None
+            if category_id:
+                category = next((c for c in get_all_categories() if str(c['id']) == category_id), None)
+                if category is None:
+                    flash('Category not found', 'error')
+                    return redirect('/books')
+            changed = update_books(user_id, book_ids, "category_id = %s", [category['id'] if category else None])
+            flash(f'Moved {changed} of {len(book_ids)} book(s) to {category["name"] if category else "No Category"}', 'success')
+        elif action == 'status':
+            status = request.form.get('reading_status')
+            if status not in ('want_to_read', 'reading', 'finished'):
+                flash('Choose a reading status', 'error')
+                return redirect('/books')
+            # Same date rules as update_progress (reading stamps the start, finished the finish),
+            # without overwriting dates already set
+            changed = update_books(user_id, book_ids, """
+                reading_status = %s,
+                start_date = IF(%s = 'reading', COALESCE(start_date, CURDATE()), start_date),
+                finish_date = IF(%s = 'finished', COALESCE(finish_date, CURDATE()), finish_date)
+            """, [status, status, status])
+            flash(f'Updated the status of {changed} of {len(book_ids)} book(s)', 'success')
+        elif action == 'tags':
+            names = parse_tag_names(request.form.get('tags', ''))
+            if not names:
+                flash('Enter at least one tag', 'error')
+                return redirect('/books')
+            added = add_book_tags(user_id, book_ids, names)
+            flash(f'Added {added} tag(s) across {len(book_ids)} book(s)', 'success')
+        elif action == 'delete':
+            deleted = soft_delete_books(user_id, book_ids)
+            flash(f'Deleted {deleted} book(s)', 'success')
+        else:
+            flash('Unknown bulk action', 'error')
+    except Exception as e:
+        flash(f'Error updating books: {str(e)}', 'error')
+    
+    return redirect('/books')
+
+@bp.route('/duplicates')
+@login_required
+def duplicates():
+    try:
+        index = get_title_index(session.get('user_id'))
+        clusters = index.clusters() if index is not None else []
+    except Exception as e:
+        flash(f'Error finding duplicates: {str(e)}', 'error')
+        return redirect('/books')
+    
+    cluster_cards = ""
+    for ids in clusters:
+        options = ""
+        for book_id in ids:
+            title, author = index.books[book_id][:2]
+            safe_title = title.replace('"', '&quot;')
+            safe_author = (author or 'Unknown Author').replace('"', '&quot;')
+            checked = 'checked' if book_id == ids[0] else ''
+            options += f'''
+                <label class="book-author" style="display: block; margin-top: 6px;">
+                    <input type="radio" name="keep_id" value="{book_id}" {checked}>
+                    {safe_title} by {safe_author} <span class="book-id">(ID {book_id})</span>
+                </label>
+                <input type="hidden" name="book_ids" value="{book_id}">
+            '''
+        cluster_cards += f'''
+        <div class="book-card">
+            <form action="/merge_books" method="post" class="book-info" onsubmit="return confirm('Merge these books into the selected one?');">
+                <h3 class="book-title">{len(ids)} similar books</h3>
+                {options}
+                <div class="book-actions" style="margin-top: 10px;">
+                    <button type="submit" class="btn btn-danger">Merge into selected</button>
+                </div>
+            </form>
+        </div>
+        '''
+    
+    if index is None:
+        cluster_cards = '''
+        <div class="empty-state">
+            <div class="empty-state-icon">⏳</div>
+            <h3>Indexing your library</h3>
+            <p>Titles are being compared in the background. Reload this page in a moment.</p>
+        </div>
+        '''
+    elif not cluster_cards:
+        cluster_cards = '''
+        <div class="empty-state">
+            <div class="empty-state-icon">✨</div>
+            <h3>No duplicates found</h3>
+            <p>Your library has no books with near-identical titles.</p>
+        </div>
+        '''
+    
+    content = f'''
+    <div class="page-header">
+        <h2 class="page-title">Possible Duplicates</h2>
+        <div class="header-actions">
+            <a href="/books" class="btn btn-secondary">Back to Books</a>
+        </div>
+    </div>
+    <div class="book-grid">
+        {cluster_cards}
+    </div>
+    <div class="stats">Total: {len(clusters)} group(s)</div>
+    '''
+    return render_template_string(render_page('Duplicates - Book Master', content))
+
+@bp.route('/merge_books', methods=['POST'])
+@login_required
+def merge_books():
+    """Fold duplicates into one book: fill its empty fields, move tags and reading history, soft-delete the rest"""
+    keep_id = request.form.get('keep_id', type=int)
+    merge_ids = [i for i in parse_ids(request.form.getlist('book_ids')) if i != keep_id]
+    if not keep_id or not merge_ids:
+        flash('Select a book to keep and at least one to merge', 'error')
+        return redirect('/duplicates')
+    
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        placeholders = ', '.join(['%s'] * (len(merge_ids) + 1))
+        cur.execute(f"SELECT * FROM books WHERE user_id = %s AND deleted_at IS NULL AND id IN ({placeholders})",
+                    [user_id, keep_id] + merge_ids)
+        rows = {row['id']: row for row in cur.fetchall()}
+        if keep_id not in rows:
+            cur.close()
+            flash('Book not found', 'error')
+            return redirect('/duplicates')
+        keep = rows.pop(keep_id)
+        merge_ids = list(rows)
+        
+        # Fill the kept book's empty fields from the duplicates
+        updates = {}
+        for field in ('author', 'link', 'file_name', 'total_pages', 'category_id', 'start_date', 'finish_date'):
+            if not keep.get(field):
+                value = next((row[field] for row in rows.values() if row.get(field)), None)
+                if value:
+                    updates[field] = value
+        furthest = max([row.get('current_page') or 0 for row in rows.values()] + [keep.get('current_page') or 0])
+        if furthest > (keep.get('current_page') or 0):
+            updates['current_page'] = furthest
+        # Always touch the kept book: it gains the duplicates' tags
+        assignments = ''.join(f'{field} = %s, ' for field in updates)
+        cur.execute(f"UPDATE books SET {assignments}updated_at = CURRENT_TIMESTAMP(6) WHERE id = %s AND user_id = %s",
+                    list(updates.values()) + [keep_id, user_id])
+        
+        if merge_ids:
+            placeholders = ', '.join(['%s'] * len(merge_ids))
+            cur.execute(f"INSERT IGNORE INTO book_tags (book_id, tag_id) SELECT %s, tag_id FROM book_tags WHERE book_id IN ({placeholders})",
+                        [keep_id] + merge_ids)
+            cur.execute(f"UPDATE reading_events SET book_id = %s WHERE user_id = %s AND book_id IN ({placeholders})",
+                        [keep_id, user_id] + merge_ids)
+            if updates.get('file_name'):
+                # The kept book now owns this file; the purge must not remove it with the duplicate
+                cur.execute(f"UPDATE books SET file_name = NULL WHERE user_id = %s AND file_name = %s AND id IN ({placeholders})",
+                            [user_id, updates['file_name']] + merge_ids)
+        cur.close()
+        # Commits the merge; purge_deleted_books() later removes the rows and their other files
+        soft_delete_books(user_id, merge_ids)
+        mysql.connection.commit()
+        card_cache.invalidate(keep_id)
+        
+        flash(f'Merged {len(merge_ids)} book(s) into "{keep["title"]}"', 'success')
+    except Exception as e:
+        flash(f'Error merging books: {str(e)}', 'error')
+    
+    return redirect('/duplicates')
+
+@bp.route('/categories')
 @login_required
 def categories():
     categories = get_all_categories()
     
+    # Count books for every category in one grouped query
+    category_counts = {}
+    try:
+        cur = mysql.connection.cursor()
+        user_id = session.get('user_id')
+        cur.execute("""
+            SELECT category_id, COUNT(*) as count FROM books
+            WHERE user_id = %s AND deleted_at IS NULL AND category_id IS NOT NULL
+            GROUP BY category_id
+        """, (user_id,))
+        category_counts = {row['category_id']: row['count'] for row in cur.fetchall()}
+        cur.close()
+    except Exception as e:
+        print(f"Error counting books per category: {e}")
+    
     category_cards = ""
     if categories:
         for cat in categories:
-            # Count books in this category
-            try:
-                cur = mysql.connection.cursor()
-                user_id = session.get('user_id')
-                cur.execute("SELECT COUNT(*) as count FROM books WHERE category_id = %s AND user_id = %s", (cat['id'], user_id))
-                result = cur.fetchone()
-                book_count = result['count'] if result else 0
-                cur.close()
-            except:
-                book_count = 0
+            book_count = category_counts.get(cat['id'], 0)
             
             safe_name = cat['name'].replace("'", "\\'").replace('"', '&quot;')
             
@@ -793,7 +2588,7 @@ def categories():
                 <div class="book-actions">
                     <a href="/books?category={cat['id']}" class="btn btn-secondary">View Books</a>
                     <form action="/delete_category/{cat['id']}" method="post" 
-                          onsubmit="return confirmDelete('{safe_name}');" style="margin: 0;">
+                          onsubmit="return confirmDelete('{safe_name}');" class="inline-form">
                         <button type="submit" class="btn btn-danger">Delete</button>
                     </form>
                 </div>
@@ -836,7 +2631,7 @@ def categories():
     
     return render_template_string(render_page('Categories - Book Master', content))
 
-@app.route('/add_category', methods=['POST'])
+@bp.route('/add_category', methods=['POST'])
 @login_required
 def add_category():
     category_name = request.form.get('category_name', '').strip()
@@ -848,6 +2643,12 @@ def add_category():
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
+        # A deleted category keeps its name until purged; finish that one now
+        cur.execute("SELECT id FROM categories WHERE name = %s AND user_id = %s AND deleted_at IS NOT NULL",
+                    (category_name, user_id))
+        pending = cur.fetchone()
+        if pending:
+            detach_category(pending['id'], user_id)
         cur.execute("INSERT INTO categories (name, user_id) VALUES (%s, %s)", (category_name, user_id))
         mysql.connection.commit()
         cur.close()
@@ -857,15 +2658,11 @@ def add_category():
     
     return redirect('/categories')
 
-@app.route('/delete_category/<int:category_id>', methods=['POST'])
+@bp.route('/delete_category/<int:category_id>', methods=['POST'])
 @login_required
 def delete_category(category_id):
     try:
-        cur = mysql.connection.cursor()
-        user_id = session.get('user_id')
-        rows = cur.execute("DELETE FROM categories WHERE id = %s AND user_id = %s", (category_id, user_id))
-        mysql.connection.commit()
-        cur.close()
+        rows = soft_delete_category(category_id, session.get('user_id'))
         
         if rows > 0:
             flash('Category deleted successfully!', 'success')
@@ -876,7 +2673,7 @@ def delete_category(category_id):
     
     return redirect('/categories')
 
-@app.route('/update_progress/<int:book_id>', methods=['GET', 'POST'])
+@bp.route('/update_progress/<int:book_id>', methods=['GET', 'POST'])
 @login_required
 def update_progress(book_id):
     if request.method == 'POST':
@@ -898,6 +2695,9 @@ def update_progress(book_id):
                 from datetime import date
                 finish_date = date.today()
             
+            if current_page:
+                record_reading_event(cur, book_id, user_id, int(current_page))
+            
             cur.execute("""
                 UPDATE books SET 
                 reading_status = %s, 
@@ -905,7 +2705,7 @@ def update_progress(book_id):
                 total_pages = %s,
                 start_date = %s,
                 finish_date = %s
-                WHERE id = %s AND user_id = %s
+                WHERE id = %s AND user_id = %s AND deleted_at IS NULL
             """, (
                 reading_status,
                 int(current_page) if current_page else 0,
@@ -917,6 +2717,7 @@ def update_progress(book_id):
             ))
             mysql.connection.commit()
             cur.close()
+            card_cache.invalidate(book_id)
             
             flash('Reading progress updated!', 'success')
             return redirect('/books')
@@ -928,7 +2729,7 @@ def update_progress(book_id):
     try:
         cur = mysql.connection.cursor()
         user_id = session.get('user_id')
-        cur.execute("SELECT * FROM books WHERE id = %s AND user_id = %s", (book_id, user_id))
+        cur.execute("SELECT * FROM books WHERE id = %s AND user_id = %s AND deleted_at IS NULL", (book_id, user_id))
         book = cur.fetchone()
         cur.close()
         
@@ -1006,32 +2807,16 @@ def update_progress(book_id):
         flash(f'Error: {str(e)}', 'error')
         return redirect('/books')
 
-@app.route('/stats')
+@bp.route('/stats')
 @login_required
 def stats():
     try:
-        cur = mysql.connection.cursor()
-        user_id = session.get('user_id')
-        
-        # Get counts by status
-        cur.execute("SELECT reading_status, COUNT(*) as count FROM books WHERE user_id = %s GROUP BY reading_status", (user_id,))
-        status_counts = {row['reading_status']: row['count'] for row in cur.fetchall()}
-        
-        # Get total books
-        cur.execute("SELECT COUNT(*) as count FROM books WHERE user_id = %s", (user_id,))
-        total_books = cur.fetchone()['count']
-        
-        # Get recently finished books
-        cur.execute("""
-            SELECT title, author, finish_date 
-            FROM books 
-            WHERE user_id = %s AND reading_status = 'finished' AND finish_date IS NOT NULL
-            ORDER BY finish_date DESC 
-            LIMIT 5
-        """, (user_id,))
-        recent_finished = cur.fetchall()
+        summary = get_library_analytics(session.get('user_id'))
+        status_counts = summary['by_status']
+        total_books = summary['total']
+        recent_finished = summary['recent_finished']
         
-        cur.close()
+        history = summarize_reading_history(get_reading_history())
         
         want_to_read = status_counts.get('want_to_read', 0)
         reading = status_counts.get('reading', 0)
@@ -1039,43 +2824,127 @@ def stats():
         
         recent_html = ""
         if recent_finished:
-            recent_html = '<div style="margin-top: 30px;"><h3 style="color: #e2e8f0; margin-bottom: 15px;">Recently Finished</h3><div style="display: grid; gap: 15px;">'
+            recent_html = '<div class="section"><h3 class="section-title">Recently Finished</h3><div class="recent-list">'
             for book in recent_finished:
                 author = book.get('author') or 'Unknown Author'
                 recent_html += f'''
-                <div style="background: #0f172a; padding: 15px; border-radius: 8px; border-left: 3px solid #22c55e;">
-                    <div style="color: #0ea5e9; font-weight: 600;">{book["title"]}</div>
-                    <div style="color: #cbd5e1; font-size: 14px;">by {author}</div>
-                    <div style="color: #64748b; font-size: 13px; margin-top: 5px;">Finished: {book["finish_date"]}</div>
+                <div class="recent-card">
+                    <div class="recent-title">{book["title"]}</div>
+                    <div class="recent-author">by {author}</div>
+                    <div class="recent-date">Finished: {book["finish_date"]}</div>
                 </div>
                 '''
             recent_html += '</div></div>'
         
+        # Pages-per-day bars for the last 30 days, scaled to the busiest day
+        max_pages = max([pages for _, pages in history['last_30_days']] + [1])
+        daily_bars = ''
+        for day, pages in history['last_30_days']:
+            height = int(pages / max_pages * 100)
+            daily_bars += f'<div title="{day}: {pages} pages" class="activity-bar" style="height: {height}%;"></div>'
+        
+        weekly_rows = ''
+        for week_start, pages in reversed(history['weekly']):
+            weekly_rows += f'<div class="weekly-row"><span>Week of {week_start}</span><span>{pages} pages</span></div>'
+        
+        # Library breakdowns from the cached analytics
+        from datetime import date
+        today = date.today()
+        finished_by_month = dict(summary['finished_by_month'])
+        months = []
+        for n in range(11, -1, -1):
+            year, month = divmod(today.year * 12 + today.month - 1 - n, 12)
+            label = f'{year}-{month + 1:02d}'
+            months.append((label, finished_by_month.get(label, 0)))
+        max_month = max([count for _, count in months] + [1])
+        month_bars = ''.join(
+            f'<div title="{month}: {count} finished" class="activity-bar" style="height: {int(count / max_month * 100)}%;"></div>'
+            for month, count in months)
+        author_rows = ''.join(f'<div class="weekly-row"><span>{author}</span><span>{count} book(s)</span></div>'
+                              for author, count in summary['top_authors'])
+        category_rows = ''.join(f'<div class="weekly-row"><span>📁 {name}</span><span>{count} book(s)</span></div>'
+                                for name, count in summary['by_category'])
+        avg_days = summary['avg_completion_days']
+        library_html = f'''
+        <div class="section">
+            <h3 class="section-title">Library</h3>
+            <div class="stat-grid">
+                <div class="feature-card">
+                    <h3 class="stat-value">{avg_days if avg_days is not None else '–'}</h3>
+                    <p class="stat-label">⏱️ Average days to finish a book</p>
+                </div>
+            </div>
+            <p class="chart-caption">Books finished per month (last 12 months)</p>
+            <div class="activity-chart">
+                {month_bars}
+            </div>
+            <div class="weekly-list">
+                <p class="chart-caption">Top authors</p>
+                {author_rows or '<p class="muted-note">No authors recorded yet.</p>'}
+            </div>
+            <div class="weekly-list">
+                <p class="chart-caption">Books per category</p>
+                {category_rows or '<p class="muted-note">No books yet.</p>'}
+            </div>
+        </div>
+        '''
+        
+        history_html = f'''
+        <div class="section">
+            <h3 class="section-title">Reading Activity</h3>
+            <div class="stat-grid">
+                <div class="feature-card">
+                    <h3 class="stat-value stat-streak">{history['current_streak']}</h3>
+                    <p class="stat-label">🔥 Day streak</p>
+                </div>
+                <div class="feature-card">
+                    <h3 class="stat-value stat-streak">{history['longest_streak']}</h3>
+                    <p class="stat-label">🏆 Longest streak</p>
+                </div>
+                <div class="feature-card">
+                    <h3 class="stat-value">{history['pages_per_active_day']}</h3>
+                    <p class="stat-label">⚡ Pages per reading day</p>
+                </div>
+            </div>
+            <p class="chart-caption">Pages per day (last 30 days)</p>
+            <div class="activity-chart">
+                {daily_bars}
+            </div>
+            <div class="weekly-list">
+                {weekly_rows or '<p class="muted-note">No reading activity yet. Update your progress to start tracking!</p>'}
+            </div>
+        </div>
+        '''
+        
         content = f'''
         <h2 class="page-title" style="margin-bottom: 30px;">📊 Reading Statistics</h2>
         
-        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px;">
+        <div class="stat-grid">
             <div class="feature-card">
-                <h3 style="font-size: 36px; color: #0ea5e9; margin-bottom: 5px;">{total_books}</h3>
-                <p style="color: #cbd5e1;">Total Books</p>
+                <h3 class="stat-value">{total_books}</h3>
+                <p class="stat-label">Total Books</p>
             </div>
             
             <div class="feature-card">
-                <h3 style="font-size: 36px; color: #6366f1; margin-bottom: 5px;">{want_to_read}</h3>
-                <p style="color: #cbd5e1;">📖 Not started</p>
+                <h3 class="stat-value stat-want_to_read">{want_to_read}</h3>
+                <p class="stat-label">📖 Not started</p>
             </div>
             
             <div class="feature-card">
-                <h3 style="font-size: 36px; color: #22c55e; margin-bottom: 5px;">{reading}</h3>
-                <p style="color: #cbd5e1;">📗 Reading</p>
+                <h3 class="stat-value stat-reading">{reading}</h3>
+                <p class="stat-label">📗 Reading</p>
             </div>
             
             <div class="feature-card">
-                <h3 style="font-size: 36px; color: #10b981; margin-bottom: 5px;">{finished}</h3>
-                <p style="color: #cbd5e1;">✅ Finished</p>
+                <h3 class="stat-value stat-finished">{finished}</h3>
+                <p class="stat-label">✅ Finished</p>
             </div>
         </div>
         
+        {history_html}
+        
+        {library_html}
+        
         {recent_html}
         
         <div style="margin-top: 30px; text-align: center;">
@@ -1088,10 +2957,166 @@ def stats():
         flash(f'Error loading stats: {str(e)}', 'error')
         return redirect('/books')
 
+@bp.route('/sync')
+@login_required
+def sync():
+    """Delta feed for client apps: everything changed after the `since` cursor.
+
+    Clients start with since=0, store `next` and call again with it while
+    `has_more` is true. `reset` means the cursor is older than the pruned
+    tombstones: drop local data and start over from 0.
+    """
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', SYNC_PAGE_SIZE, type=int), 1), SYNC_PAGE_SIZE)
+    user_id = session.get('user_id')
+    try:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT seq, pruned_seq FROM sync_cursors WHERE user_id = %s", (user_id,))
+        cursor = cur.fetchone() or {'seq': 0, 'pruned_seq': 0}
+        cur.close()
+        if 0 < since < cursor['pruned_seq']:
+            return jsonify(reset=True, next=0, has_more=True, books=[], categories=[], deleted=[])
+        if since >= cursor['seq']:
+            return jsonify(reset=False, next=since, has_more=False, books=[], categories=[], deleted=[])
+        
+        changes, has_more = sync_changes(user_id, since, limit)
+    except Exception as e:
+        print(f"Error building sync feed: {e}")
+        return jsonify(error='Sync failed, please retry'), 500
+    
+    live_ids = [row['id'] for kind, row in changes if kind == 'book' and not row['deleted_at']]
+    book_tags = get_book_tags(live_ids)
+    books, categories, deleted = [], [], []
+    for kind, row in changes:
+        if kind == 'category' and row['deleted_at']:
+            deleted.append({'type': 'category', 'id': row['id'], 'seq': row['change_seq']})
+        elif kind == 'category':
+            categories.append({'id': row['id'], 'name': row['name'], 'seq': row['change_seq']})
+        elif kind == 'tombstone':
+            deleted.append({'type': row['entity'], 'id': row['entity_id'], 'seq': row['change_seq']})
+        elif row['deleted_at']:
+            deleted.append({'type': 'book', 'id': row['id'], 'seq': row['change_seq']})
+        else:
+            book = {field: row[field] for field in ('id', 'title', 'author', 'link', 'isbn', 'category_id',
+                                                   'reading_status', 'total_pages', 'current_page', 'cover_key')}
+            for field in ('start_date', 'finish_date', 'updated_at'):
+                book[field] = row[field].isoformat() if row[field] else None
+            book['has_file'] = bool(row['file_name'])
+            book['tags'] = [tag['name'] for tag in book_tags.get(row['id'], [])]
+            book['seq'] = row['change_seq']
+            books.append(book)
+    next_seq = changes[-1][1]['change_seq'] if changes else since
+    # Larger pages are compressed by compress_response like any JSON body
+    return jsonify(reset=False, next=next_seq, has_more=has_more, books=books, categories=categories, deleted=deleted)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Expose counters (throttled, queued and shed requests) in Prometheus text format"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+@bp.cli.command('precompress-assets')
+def precompress_assets_command():
+    """Write .gz/.br copies of static files so /assets serves them without compressing per request"""
+    written = assets.precompress(current_app.static_folder)
+    print(f"✅ Wrote {len(written)} precompressed file(s)")
+
+@bp.cli.command('vendor-assets')
+def vendor_assets_command():
+    """Fetch the pinned third-party files (PDF.js) into static/ so nothing is loaded from a CDN"""
+    written = assets.vendor(current_app.static_folder)
+    print(f"✅ Vendored {len(written)} file(s)")
+
+@bp.cli.command('generate-covers')
+def generate_covers_command():
+    """Create thumbnails for books that have a cover source but no thumbnails yet (e.g. ISBN imports)"""
+    app = current_app._get_current_object()
+    done = 0
+    for shard in mysql.shard_ids():
+        cur = mysql.shard(shard).cursor()
+        last_id = 0
+        while True:
+            cur.execute("""
+                SELECT id, user_id, file_name, cover_url FROM books
+                WHERE id > %s AND cover_key IS NULL AND deleted_at IS NULL AND (file_name IS NOT NULL OR cover_url IS NOT NULL)
+                ORDER BY id LIMIT 500
+            """, (last_id,))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            futures = [get_thumbnailer().pool.submit(generate_cover, app, row['id'], row['user_id'],
+                                                     row['file_name'], row['cover_url'])
+                       for row in rows]
+            for future in futures:
+                future.result()
+            done += len(rows)
+            last_id = rows[-1]['id']
+        cur.close()
+    print(f"✅ Processed {done} book(s)")
+
+@bp.cli.command('purge-deleted')
+def purge_deleted_command():
+    """Hard-delete soft-deleted books (with their files) and categories now instead of waiting for the background job"""
+    purged = categories = 0
+    for shard in mysql.shard_ids():
+        with mysql.using(shard):
+            purged += purge_deleted_books(current_app.config['PURGE_BATCH_SIZE'])
+            while True:
+                batch = purge_deleted_categories(current_app.config['PURGE_BATCH_SIZE'])
+                categories += batch
+                if not batch:
+                    break
+    print(f"✅ Purged {purged} deleted book(s) and {categories} deleted categor{'y' if categories == 1 else 'ies'}")
+
+@bp.cli.command('prune-tombstones')
+def prune_tombstones_command():
+    """Drop sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS (default 90)"""
+    retention_days = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+    deleted = 0
+    for shard in mysql.shard_ids():
+        with mysql.using(shard):
+            deleted += prune_sync_tombstones(retention_days)
+    print(f"✅ Removed {deleted} tombstone(s) older than {retention_days} days")
+
+@bp.cli.command('compact-events')
+def compact_events_command():
+    """Drop raw reading events older than READING_EVENTS_RETENTION_DAYS (default 90)"""
+    retention_days = int(os.environ.get('READING_EVENTS_RETENTION_DAYS', 90))
+    deleted = 0
+    for shard in mysql.shard_ids():
+        with mysql.using(shard):
+            deleted += compact_reading_events(retention_days)
+    print(f"✅ Removed {deleted} reading event(s) older than {retention_days} days")
+
+@bp.cli.command('scan-storage')
+@click.option('--repair', is_flag=True, help='Quarantine orphan files and clear dangling file_name values')
+@click.option('--all', 'all_buckets', is_flag=True, help='Scan every bucket instead of the next one')
+def scan_storage_command(repair, all_buckets):
+    """Report upload files without a book and books whose file is missing"""
+    for report in scan_storage(repair, all_buckets):
+        print(f"Bucket {report['bucket'] + 1}/{report['buckets']}: {report['files']} file(s) checked, "
+              f"{report['orphans']} orphan(s), {report['dangling']} dangling reference(s)")
+        for name in report['orphan_sample']:
+            print(f"  orphan: {name}")
+        for shard, book_id, name in report['dangling_sample']:
+            print(f"  dangling: book {book_id} on shard {shard} -> {name}")
+        if repair:
+            print(f"  repaired {report['repaired']}")
+            if report['repair_skipped']:
+                print(f"  {report['repair_skipped']} orphan(s) left in place while a user is being moved")
+    print("✅ Storage scan finished")
+
+@bp.cli.command('move-user')
+@click.argument('user_id', type=int)
+@click.argument('shard', type=int)
+def move_user_command(user_id, shard):
+    """Move a user's rows to another shard; the user can read but not write meanwhile"""
+    if shard not in mysql.shard_ids():
+        raise click.BadParameter(f'No shard {shard}; configured: {len(mysql.shard_ids())}')
+    move_user(mysql, user_id, shard)
+
 if __name__ == '__main__':
     
-    with app.app_context():
-        init_tables()
+    app = create_app()
     
     print("\nStarting Flask server...")
     #threading.Timer(1.5, open_browser).start()
@@ -0,0 +1,131 @@
+"""Static asset fingerprinting and response compression helpers.
+
+Assets are addressed as name.<hash>.ext so they can be cached forever; a new
+build changes the hash and therefore the URL. brotli is optional: without
+it, gzip is used for both dynamic responses and precompressed files.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import urllib.request
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Browsers only run ES modules served with a JavaScript type
+mimetypes.add_type('text/javascript', '.mjs')
+
+# Third-party files served from static/ like our own assets instead of a CDN;
+# `flask vendor-assets` (re)fetches these pinned versions
+VENDORED = {
+    'vendor/pdfjs/pdf.min.mjs': 'https://cdn.jsdelivr.net/npm/pdfjs-dist@4.2.67/build/pdf.min.mjs',
+    'vendor/pdfjs/pdf.worker.min.mjs': 'https://cdn.jsdelivr.net/npm/pdfjs-dist@4.2.67/build/pdf.worker.min.mjs',
+}
+
+_fingerprints = {}
+
+
+def fingerprint(static_folder, filename):
+    """Return filename with a content hash inserted before the extension"""
+    if filename not in _fingerprints:
+        with open(os.path.join(static_folder, filename), 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+        base, ext = os.path.splitext(filename)
+        _fingerprints[filename] = f'{base}.{digest}{ext}'
+    return _fingerprints[filename]
+
+
+def resolve(static_folder, fingerprinted):
+    """Map a fingerprinted name back to the real file, or None if the hash is stale"""
+    base, ext = os.path.splitext(fingerprinted)
+    original, _, digest = base.rpartition('.')
+    if not original or not digest:
+        return None
+    filename = original + ext
+    # safe_join refuses names escaping static/, which would otherwise also be
+    # read and remembered in _fingerprints
+    path = safe_join(static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    if fingerprint(static_folder, filename) != fingerprinted:
+        return None
+    return filename
+
+
+def precompressed(path, suffix):
+    """Return the .gz/.br sibling of path if it exists and is not older than the source.
+
+    A stale sibling (source edited without re-running precompress-assets)
+    would otherwise be served under the new fingerprint and cached forever.
+    """
+    sibling = path + suffix
+    try:
+        if os.stat(sibling).st_mtime >= os.stat(path).st_mtime:
+            return sibling
+    except OSError:
+        pass
+    return None
+
+
+def pick_encoding(accept_encoding):
+    """Choose the best encoding the client accepts, preferring brotli"""
+    accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').lower().split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def precompress(static_folder, min_size=1024):
+    """Write .gz (and .br when available) siblings for compressible static files"""
+    written = []
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if name.endswith(('.gz', '.br')):
+                continue
+            if not name.endswith(('.css', '.js', '.mjs', '.svg', '.html', '.txt', '.json')):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            encodings = ['gzip', 'br'] if brotli is not None else ['gzip']
+            for encoding in encodings:
+                target = path + ('.br' if encoding == 'br' else '.gz')
+                with open(target, 'wb') as f:
+                    f.write(compress(data, encoding))
+                written.append(target)
+    return written
+
+
+def vendor(static_folder, timeout=30):
+    """Download the VENDORED files into static/; returns the paths written"""
+    written = []
+    for filename, url in VENDORED.items():
+        target = os.path.join(static_folder, filename)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            data = response.read()
+        with open(target, 'wb') as f:
+            f.write(data)
+        written.append(target)
+    return written
+
+
+def vendored_present(static_folder):
+    return all(os.path.isfile(os.path.join(static_folder, name)) for name in VENDORED)
@@ -0,0 +1,81 @@
+"""Time the /stats analytics queries for a user with N books.
+
+Seeds the user's library straight into MySQL (same MYSQL_* environment
+variables as the app, schema already created by the app) with authors,
+categories, statuses and start/finish dates spread over a few years, then
+times analytics.library_summary() - the cold path behind the per-user cache.
+
+    python benchmarks/bench_analytics.py --username demo --books 100000
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+
+
+def connect():
+    import MySQLdb
+    import MySQLdb.cursors
+    return MySQLdb.connect(host=os.environ.get('MYSQL_HOST', 'localhost'),
+                           user=os.environ.get('MYSQL_USER', 'root'),
+                           passwd=os.environ.get('MYSQL_PASSWORD', ''),
+                           db=os.environ.get('MYSQL_DB', 'books'),
+                           cursorclass=MySQLdb.cursors.DictCursor)
+
+
+def seed(db, user_id, count):
+    cur = db.cursor()
+    cur.executemany("INSERT IGNORE INTO categories (name, user_id) VALUES (%s, %s)",
+                    [(f'Bench Category {n}', user_id) for n in range(12)])
+    cur.execute("SELECT id FROM categories WHERE user_id = %s", (user_id,))
+    category_ids = [row['id'] for row in cur.fetchall()]
+    cur.execute("SELECT COUNT(*) AS count FROM books WHERE user_id = %s AND deleted_at IS NULL", (user_id,))
+    existing = cur.fetchone()['count']
+    start = datetime.date(2023, 1, 1)
+    rows = []
+    for n in range(existing, count):
+        status = ('want_to_read', 'reading', 'finished')[n % 3]
+        started = start + datetime.timedelta(days=n % 1000) if status != 'want_to_read' else None
+        finished = started + datetime.timedelta(days=5 + n % 60) if status == 'finished' else None
+        rows.append((f'Bench Book {n}', f'Author {n % 997}', user_id, category_ids[n % len(category_ids)],
+                     status, started, finished))
+    for i in range(0, len(rows), 5000):
+        cur.executemany("""INSERT INTO books (title, author, user_id, category_id, reading_status, start_date, finish_date)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s)""", rows[i:i + 5000])
+        db.commit()
+    cur.close()
+    return max(count, existing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    db = connect()
+    cur = db.cursor()
+    cur.execute("SELECT id FROM users WHERE username = %s", (args.username,))
+    user_id = cur.fetchone()['id']
+    print(f"library size: {seed(db, user_id, args.books)} books")
+
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        summary = analytics.library_summary(cur, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    cur.close()
+    print(f"library_summary: median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms "
+          f"({len(summary['by_category'])} categories, {len(summary['finished_by_month'])} months, "
+          f"avg completion {summary['avg_completion_days']} days)")
+
+
+if __name__ == '__main__':
+    main()
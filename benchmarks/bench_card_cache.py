@@ -0,0 +1,69 @@
+"""Time assembling the /books card list for N books, cold vs warm fragment cache.
+
+Uses synthetic rows shaped like the listing query, so no database is needed.
+
+    python benchmarks/bench_card_cache.py --books 10000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import card_cache, render_book_card  # noqa: E402
+
+
+def make_books(count):
+    updated = datetime.datetime(2026, 1, 1)
+    return [{
+        'id': n, 'title': f'Book {n}', 'author': f'Author {n % 97}', 'link': f'https://example.com/{n}',
+        'file_name': f'{n}_book.pdf' if n % 3 == 0 else None, 'category_name': f'Category {n % 12}',
+        'reading_status': ('want_to_read', 'reading', 'finished')[n % 3], 'total_pages': 300,
+        'current_page': n % 300, 'start_date': datetime.date(2026, 1, 1), 'finish_date': None,
+        'updated_at': updated,
+    } for n in range(count)]
+
+
+def assemble(books, tags):
+    html = ''
+    for book in books:
+        key = (book['id'], book['updated_at'], book['category_name'], tuple(t['name'] for t in tags))
+        html += card_cache.get_or_set(key, lambda: render_book_card(book, tags))
+    return html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    books = make_books(args.books)
+    tags = [{'name': 'classic'}, {'name': 'to-lend'}]
+
+    started = time.perf_counter()
+    uncached = ''.join(render_book_card(book, tags) for book in books)
+    render_ms = (time.perf_counter() - started) * 1000
+
+    card_cache.clear()
+    started = time.perf_counter()
+    assemble(books, tags)
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    warm = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        html = assemble(books, tags)
+        warm.append((time.perf_counter() - started) * 1000)
+    assert html == uncached
+
+    print(f"{args.books} books, {len(uncached):,} bytes of cards")
+    print(f"  no cache     {render_ms:8.1f} ms")
+    print(f"  cold cache   {cold_ms:8.1f} ms")
+    print(f"  warm cache   {min(warm):8.1f} ms (best of {args.rounds}), hit rate {card_cache.hit_rate():.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Time building the duplicate index and checking a title against it.
+
+    python benchmarks/bench_dedupe.py --books 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import TitleIndex  # noqa: E402
+
+COMMON = ('the of and a in shadow river night king queen war peace secret garden stone fire '
+          'empire house city last first lost world dark light winter summer song blood').split()
+
+
+def vocabulary(rng, size=3000):
+    """Common title words plus pronounceable made-up words for variety"""
+    consonants, vowels = 'bcdfghklmnprstvw', 'aeiou'
+    made_up = {''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+               for _ in range(size)}
+    return COMMON * 20 + sorted(made_up)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--checks', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    words = vocabulary(rng)
+    titles = [' '.join(rng.choice(words) for _ in range(rng.randint(2, 6))) + f' {n}' for n in range(args.books)]
+
+    index = TitleIndex()
+    started = time.perf_counter()
+    for book_id, title in enumerate(titles):
+        index.add(book_id, title, f'Author {book_id % 500}')
+    build_s = time.perf_counter() - started
+
+    timings = []
+    found = 0
+    for _ in range(args.checks):
+        title = rng.choice(titles)
+        # Typical near-duplicate: different case, punctuation and a dropped character
+        probe = title.upper().replace(' ', ', ', 1)[:-1]
+        started = time.perf_counter()
+        found += bool(index.matches(probe))
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"{args.books} books indexed in {build_s:.2f} s")
+    print(f"check: median {statistics.median(timings):.3f} ms, p99 {timings[int(len(timings) * 0.99) - 1]:.3f} ms, "
+          f"near-duplicates found {found}/{args.checks}")
+
+
+if __name__ == '__main__':
+    main()
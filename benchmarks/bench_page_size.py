@@ -0,0 +1,62 @@
+"""Measure bytes-on-wire for /books with and without response compression.
+
+Optionally seeds the given user's library to N books first (straight into
+MySQL, using the same MYSQL_* environment variables as the app).
+
+    python benchmarks/bench_page_size.py --username demo --password demo --seed 1000
+"""
+import argparse
+import http.cookiejar
+import os
+import urllib.parse
+import urllib.request
+
+
+def seed(username, count):
+    import MySQLdb
+    db = MySQLdb.connect(host=os.environ.get('MYSQL_HOST', 'localhost'),
+                         user=os.environ.get('MYSQL_USER', 'root'),
+                         passwd=os.environ.get('MYSQL_PASSWORD', ''),
+                         db=os.environ.get('MYSQL_DB', 'books'))
+    cur = db.cursor()
+    cur.execute("SELECT id FROM users WHERE username = %s", (username,))
+    user_id = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM books WHERE user_id = %s", (user_id,))
+    existing = cur.fetchone()[0]
+    rows = [(f'Benchmark Book {n}', f'Author {n % 97}', user_id, 'reading', 300, n % 300)
+            for n in range(existing, count)]
+    cur.executemany("""INSERT INTO books (title, author, user_id, reading_status, total_pages, current_page)
+                       VALUES (%s, %s, %s, %s, %s, %s)""", rows)
+    db.commit()
+    db.close()
+    return max(count, existing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/books')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--seed', type=int, default=0, help='make sure the user has at least this many books')
+    args = parser.parse_args()
+
+    if args.seed:
+        print(f"library size: {seed(args.username, args.seed)} books")
+
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    data = urllib.parse.urlencode({'username': args.username, 'password': args.password}).encode()
+    opener.open(f'{args.base_url}/login', data=data).read()
+
+    baseline = None
+    for encoding in ('identity', 'gzip', 'br'):
+        request = urllib.request.Request(args.base_url + args.path, headers={'Accept-Encoding': encoding})
+        with opener.open(request) as response:
+            body = response.read()
+            used = response.headers.get('Content-Encoding', 'identity')
+        baseline = baseline or len(body)
+        print(f"Accept-Encoding {encoding:<9} -> {used:<9} {len(body):>10,} bytes  ({len(body) / baseline:6.1%})")
+
+
+if __name__ == '__main__':
+    main()
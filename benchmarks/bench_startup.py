@@ -0,0 +1,54 @@
+"""Measure cold start: interpreter launch -> import app -> first response.
+
+Each run is a fresh interpreter so nothing is warm in sys.modules.
+
+    python benchmarks/bench_startup.py --runs 20 --path /books
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+flask_app = module.create_app()
+t2 = time.perf_counter()
+response = flask_app.test_client().get(sys.argv[1])
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "factory": t2 - t1, "first_response": t3 - t2, "status": response.status_code}))
+'''
+
+
+def run_once(path):
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD, path], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    total = time.perf_counter() - started
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['total'] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/books')
+    args = parser.parse_args()
+
+    results = [run_once(args.path) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts, first request GET {args.path} -> {results[0]['status']}")
+    for key in ('import', 'factory', 'first_response', 'total'):
+        values = [r[key] * 1000 for r in results]
+        print(f"  {key:<15} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
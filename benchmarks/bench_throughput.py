@@ -0,0 +1,107 @@
+"""Compare /books throughput with 1 worker vs N gunicorn workers.
+
+Starts gunicorn (gunicorn.conf.py) for each worker count, logs in once per
+client thread and hammers the target path for a fixed duration.
+
+    python benchmarks/bench_throughput.py --username demo --password demo --workers 1 4
+"""
+import argparse
+import http.cookiejar
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_client(base_url, username, password):
+    """Build an opener with its own cookie jar, logged in if credentials are given"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    if username:
+        data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+        opener.open(f'{base_url}/login', data=data).read()
+    return opener
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/login', timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def hammer(base_url, path, args):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def client():
+        opener = make_client(base_url, args.username, args.password)
+        local = []
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                opener.open(base_url + path).read()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0]
+
+
+def run(worker_count, args):
+    port = args.port
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, WEB_CONCURRENCY=str(worker_count), BIND=f'127.0.0.1:{port}', ACCESS_LOG='/dev/null')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(base_url)
+        latencies, errors = hammer(base_url, args.path, args)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    latencies.sort()
+    ms = [l * 1000 for l in latencies]
+    rps = len(latencies) / args.duration
+    p99 = ms[int(len(ms) * 0.99) - 1] if ms else 0
+    median = statistics.median(ms) if ms else 0
+    print(f"workers={worker_count:<3} {rps:8.1f} req/s   p50 {median:7.1f} ms   p99 {p99:7.1f} ms   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--path', default='/books')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--username')
+    parser.add_argument('--password', default='')
+    args = parser.parse_args()
+
+    for worker_count in args.workers:
+        run(worker_count, args)
+
+
+if __name__ == '__main__':
+    main()
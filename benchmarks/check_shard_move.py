@@ -0,0 +1,143 @@
+"""Check user placement, routing and move_user() against local MySQL databases.
+
+Creates two databases on one server (tables are created by the app on the
+first request), runs the app with MYSQL_SHARDS pointing at them and drives
+it through its routes with Flask's test client:
+
+1. a new user gets a user_shards row, and its rows land on that shard;
+2. a user without a row (registered before sharding) resolves to shard 0;
+3. after move_user() every row is on the target, nothing is left on the
+   source, and the routes read and write on the target.
+
+    python benchmarks/check_shard_move.py --url mysql://root:pw@localhost --prefix bm_check
+
+Exits non-zero at the first failed check; --drop removes the databases.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shards import DIRECTORY, parse_shard_url  # noqa: E402
+
+OWNED = (('books', 'user_id'), ('categories', 'user_id'), ('tags', 'user_id'),
+         ('reading_events', 'user_id'), ('sync_cursors', 'user_id'))
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def server_connection(url):
+    import MySQLdb
+    config = parse_shard_url(url.rstrip('/') + '/mysql')
+    return MySQLdb.connect(host=config['host'], port=config['port'], user=config['user'],
+                           password=config['password'])
+
+
+def counts(db, user_id):
+    cur = db.cursor()
+    result = {}
+    for table, owner in OWNED:
+        cur.execute(f"SELECT COUNT(*) AS n FROM {table} WHERE {owner} = %s", (user_id,))
+        result[table] = cur.fetchone()['n']
+    cur.execute("SELECT COUNT(*) AS n FROM book_tags bt JOIN books b ON b.id = bt.book_id WHERE b.user_id = %s",
+                (user_id,))
+    result['book_tags'] = cur.fetchone()['n']
+    cur.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='mysql://root@localhost', help='server URL without a database')
+    parser.add_argument('--prefix', default='bookmaster_shard_check')
+    parser.add_argument('--drop', action='store_true', help='drop the databases afterwards')
+    args = parser.parse_args()
+
+    names = [f'{args.prefix}_{n}' for n in range(2)]
+    server = server_connection(args.url)
+    for name in names:
+        server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS {name}")
+
+    from app import create_app, mysql
+    from shards import move_user
+    app = create_app({
+        'MYSQL_SHARDS': [f'{args.url.rstrip("/")}/{name}' for name in names],
+        'SHARD_MAP_TTL': 0, 'RATELIMIT_ENABLED': False, 'PURGE_INTERVAL': 0, 'INTEGRITY_INTERVAL': 0,
+    })
+    client = app.test_client()
+    try:
+        username = f'shard_check_{random.getrandbits(32):08x}'
+        client.post('/register', data={'username': username, 'password': 'pw', 'confirm': 'pw'})
+        client.post('/login', data={'username': username, 'password': 'pw'})
+        client.post('/add_category', data={'category_name': 'Moved'})
+
+        with app.app_context():
+            cur = mysql.directory.cursor()
+            cur.execute("SELECT id FROM users WHERE username = %s", (username,))
+            user_id = cur.fetchone()['id']
+            cur.execute("SELECT shard FROM user_shards WHERE user_id = %s", (user_id,))
+            row = cur.fetchone()
+            cur.close()
+            check(row is not None, f"user {user_id} has a placement row")
+            source = row['shard']
+            check(mysql.shard_for(user_id) == source, f"user {user_id} routes to shard {source}")
+            cur = mysql.shard(source).cursor()
+            cur.execute("SELECT id FROM categories WHERE user_id = %s", (user_id,))
+            category_id = cur.fetchone()['id']
+            cur.close()
+
+        client.post('/add_book', data={'title': 'Shard Check', 'author': 'Tester', 'link': '',
+                                       'category_id': str(category_id), 'total_pages': '100',
+                                       'tags': 'moved, checked', 'isbn': ''})
+        with app.app_context():
+            cur = mysql.shard(source).cursor()
+            cur.execute("SELECT id FROM books WHERE user_id = %s", (user_id,))
+            book = cur.fetchone()
+            cur.close()
+        check(book is not None, f"book written on shard {source}")
+        client.post(f'/reading_position/{book["id"]}', data={'page': 10, 'total_pages': 100})
+
+        with app.app_context():
+            before = counts(mysql.shard(source), user_id)
+            check(all(before.values()), f"rows on the source: {before}")
+
+            # A user registered before sharding has no placement row and stays on the directory
+            cur = mysql.directory.cursor()
+            cur.execute("INSERT INTO users (username, password_hash) VALUES (%s, 'x')", (username + '_legacy',))
+            legacy_id = cur.lastrowid
+            mysql.directory.commit()
+            cur.close()
+            check(mysql.shard_for(legacy_id) == DIRECTORY, "a user without a placement row resolves to shard 0")
+
+            target = 1 - source
+            move_user(mysql, user_id, target, settle=1)
+            after = counts(mysql.shard(target), user_id)
+            left = counts(mysql.shard(source), user_id)
+            check(after == before, f"every row copied to shard {target}: {after}")
+            check(not any(left.values()), f"nothing left on shard {source}: {left}")
+            check(mysql.shard_for(user_id) == target and not mysql.is_moving(user_id),
+                  f"user routes to shard {target} and is not moving")
+
+        page = client.get('/books').get_data(as_text=True)
+        check('Shard Check' in page, "/books reads the moved book")
+        client.post(f'/edit_book/{book["id"]}', data={'title': 'Shard Check Edited', 'author': 'Tester',
+                                                     'link': '', 'category_id': str(category_id), 'tags': 'moved'})
+        with app.app_context():
+            cur = mysql.shard(target).cursor()
+            cur.execute("SELECT title FROM books WHERE id = %s", (book['id'],))
+            check(cur.fetchone()['title'] == 'Shard Check Edited', "edits land on the target shard")
+            cur.close()
+    finally:
+        if args.drop:
+            for name in names:
+                server.cursor().execute(f"DROP DATABASE IF EXISTS {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Run the Locust scenario pack at increasing user counts and report saturation.
+
+Starts gunicorn (gunicorn.conf.py) with the given worker count, runs
+locustfile.py headless once per user count and prints per-route latency
+percentiles for every step, then the saturation curve (throughput and
+aggregate percentiles against concurrent users). The curve is also written
+as CSV next to Locust's own per-step CSV files.
+
+    python benchmarks/load_sweep.py --workers 4 --users 10 50 100 200 --duration 60
+
+Rate limiting is disabled on the server unless --rate-limits is given, so
+the curve shows capacity rather than the configured throttles.
+"""
+import argparse
+import csv
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+from bench_throughput import ROOT, wait_for_server
+
+PERCENTILES = ('50%', '95%', '99%')
+
+
+def read_stats(prefix):
+    """Rows of Locust's <prefix>_stats.csv keyed by request name"""
+    with open(f'{prefix}_stats.csv', newline='') as f:
+        return {row['Name']: row for row in csv.DictReader(f)}
+
+
+def run_step(users, args, base_url, out_dir):
+    prefix = os.path.join(out_dir, f'users_{users}')
+    subprocess.run([
+        sys.executable, '-m', 'locust', '-f', os.path.join(ROOT, 'benchmarks', 'locustfile.py'),
+        '--headless', '--host', base_url, '--users', str(users),
+        '--spawn-rate', str(args.spawn_rate or users), '--run-time', f'{args.duration}s',
+        '--csv', prefix, '--only-summary', '--loglevel', 'WARNING',
+    ], check=False, stdout=subprocess.DEVNULL)
+    return read_stats(prefix)
+
+
+def print_routes(users, stats):
+    print(f"\n--- {users} users ---")
+    print(f"{'route':<28} {'reqs':>7} {'fail':>6} {'req/s':>8} " + ' '.join(f'{p:>7}' for p in PERCENTILES))
+    for name, row in sorted(stats.items(), key=lambda item: item[0] == 'Aggregated'):
+        print(f"{name:<28} {row['Request Count']:>7} {row['Failure Count']:>6} {float(row['Requests/s']):8.1f} "
+              + ' '.join(f"{row[p]:>7}" for p in PERCENTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--spawn-rate', type=float, help='users started per second (default: all at once)')
+    parser.add_argument('--duration', type=int, default=60, help='seconds per step')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate-limits', action='store_true', help='keep the app rate limits enabled')
+    parser.add_argument('--out', help='directory for CSV output (default: a temp dir)')
+    args = parser.parse_args()
+
+    out_dir = args.out or tempfile.mkdtemp(prefix='load_sweep_')
+    os.makedirs(out_dir, exist_ok=True)
+    base_url = f'http://127.0.0.1:{args.port}'
+    env = dict(os.environ, WEB_CONCURRENCY=str(args.workers), BIND=f'127.0.0.1:{args.port}',
+               ACCESS_LOG='/dev/null', RATELIMIT_ENABLED='1' if args.rate_limits else '0')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    curve = []
+    try:
+        wait_for_server(base_url)
+        for users in args.users:
+            stats = run_step(users, args, base_url, out_dir)
+            print_routes(users, stats)
+            total = stats['Aggregated']
+            curve.append([users, round(float(total['Requests/s']), 1), total['Failure Count'],
+                          total['Request Count']] + [total[p] for p in PERCENTILES])
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    header = ['users', 'req/s', 'failures', 'requests'] + [f'p{p.rstrip("%")} ms' for p in PERCENTILES]
+    print(f"\n=== saturation, {args.workers} worker(s) ===")
+    print(' '.join(f'{h:>10}' for h in header))
+    for row in curve:
+        print(' '.join(f'{v:>10}' for v in row))
+    path = os.path.join(out_dir, f'saturation_{args.workers}w.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(curve)
+    print(f"\nCSV written to {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
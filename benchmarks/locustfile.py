@@ -0,0 +1,199 @@
+"""Locust scenarios modelled on the real routes and form fields in app.py.
+
+Each simulated user registers its own account, so runs start from an empty
+database as well as from a seeded one. The mix (class weights) is roughly a
+reading-app day: mostly browsing, some searching and progress updates, few
+uploads, and the occasional login burst.
+
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000
+    python benchmarks/load_sweep.py --workers 4 --users 10 50 100 200
+
+Rate limits apply as in production; 429 and 503 responses are reported as
+failures named "throttled" / "shed". Start the server with
+RATELIMIT_ENABLED=0 to measure raw capacity instead.
+"""
+import itertools
+import random
+import re
+
+import gevent
+from locust import HttpUser, between, task
+
+BOOK_ID = re.compile(r'/edit_book/(\d+)')
+CATEGORY_ID = re.compile(r'/books\?category=(\d+)')
+TAG_ID = re.compile(r'[?&]tag=(\d+)')
+
+WORDS = ['dune', 'foundation', 'hyperion', 'neuromancer', 'solaris', 'ubik', 'gideon', 'piranesi', 'circe', 'beloved']
+CATEGORIES = ['Fiction', 'Science', 'History', 'Poetry']
+TAGS = ['classic', 'sci-fi', 'to-lend', 'favourite', 'book-club']
+STATUSES = ['want_to_read', 'reading', 'finished']
+
+# A small valid PDF so uploads exercise file saving and cover extraction
+PDF = (b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+       b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+       b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 300 400]>>endobj\n'
+       b'trailer<</Root 1 0 R>>\n%%EOF\n')
+
+_ids = itertools.count()
+
+
+def check(response):
+    """Turn throttling into named failures so percentiles only cover served requests"""
+    if response.status_code == 429:
+        response.failure('throttled')
+    elif response.status_code == 503:
+        response.failure('shed')
+    elif response.status_code >= 400:
+        response.failure(f'HTTP {response.status_code}')
+    else:
+        response.success()
+
+
+class LibraryUser(HttpUser):
+    """Base: an account with a few categories and books, and the ids seen on /books"""
+    abstract = True
+    wait_time = between(1, 3)
+    seed_books = 20
+
+    def on_start(self):
+        self.username = f'load_{random.getrandbits(32):08x}_{next(_ids)}'
+        self.password = 'load-test'
+        self.client.post('/register', data={'username': self.username, 'password': self.password,
+                                            'confirm': self.password}, name='/register')
+        self.client.post('/login', data={'username': self.username, 'password': self.password}, name='/login')
+        for name in CATEGORIES:
+            self.client.post('/add_category', data={'category_name': name}, name='/add_category')
+        self.refresh_ids()
+        for n in range(self.seed_books):
+            self.add_book(with_file=False, title=f'{random.choice(WORDS).title()} {n}')
+        self.refresh_ids()
+
+    def refresh_ids(self):
+        html = self.client.get('/books', name='/books').text
+        self.book_ids = [int(i) for i in dict.fromkeys(BOOK_ID.findall(html))]
+        self.category_ids = [int(i) for i in dict.fromkeys(CATEGORY_ID.findall(html))]
+        self.tag_ids = [int(i) for i in dict.fromkeys(TAG_ID.findall(html))]
+
+    def add_book(self, with_file=True, title=None):
+        data = {
+            'title': title or f'{random.choice(WORDS).title()} {random.randint(1, 99999)}',
+            'author': f'Author {random.randint(1, 500)}',
+            'link': '',
+            'category_id': str(random.choice(self.category_ids)) if self.category_ids else '',
+            'total_pages': str(random.randint(100, 900)),
+            'tags': ', '.join(random.sample(TAGS, 2)),
+            'isbn': '',
+        }
+        files = {'file': ('book.pdf', PDF, 'application/pdf')} if with_file else None
+        with self.client.post('/add_book', data=data, files=files, name='/add_book', catch_response=True) as r:
+            check(r)
+
+
+class Browser(LibraryUser):
+    """Toggles status, category and tag filters on /books, glances at stats"""
+    weight = 6
+
+    @task(6)
+    def filter_books(self):
+        params = {}
+        if random.random() < 0.5:
+            params['status'] = random.choice(STATUSES)
+        if self.category_ids and random.random() < 0.5:
+            params['category'] = random.choice(self.category_ids)
+        if self.tag_ids and random.random() < 0.3:
+            params['tag'] = random.sample(self.tag_ids, min(len(self.tag_ids), random.randint(1, 2)))
+        with self.client.get('/books', params=params, name='/books?filters', catch_response=True) as r:
+            check(r)
+
+    @task(2)
+    def all_books(self):
+        with self.client.get('/books', name='/books', catch_response=True) as r:
+            check(r)
+
+    @task(1)
+    def stats(self):
+        with self.client.get('/stats', name='/stats', catch_response=True) as r:
+            check(r)
+
+    @task(1)
+    def categories(self):
+        with self.client.get('/categories', name='/categories', catch_response=True) as r:
+            check(r)
+
+    @task(1)
+    def sync(self):
+        with self.client.get('/sync', params={'since': 0}, name='/sync', catch_response=True) as r:
+            check(r)
+
+
+class Searcher(LibraryUser):
+    """Types a query into the search box, one request per keystroke"""
+    weight = 2
+    wait_time = between(2, 5)
+
+    @task
+    def type_query(self):
+        word = random.choice(WORDS)
+        for end in range(2, len(word) + 1):
+            with self.client.get('/books', params={'q': word[:end]}, name='/books?q', catch_response=True) as r:
+                check(r)
+            gevent.sleep(random.uniform(0.1, 0.3))
+
+
+class Reader(LibraryUser):
+    """Reading sessions: debounced page saves and progress form updates"""
+    weight = 3
+    wait_time = between(0.5, 2)
+
+    @task(4)
+    def turn_pages(self):
+        if not self.book_ids:
+            return
+        book_id = random.choice(self.book_ids)
+        page = random.randint(1, 400)
+        with self.client.post(f'/reading_position/{book_id}', data={'page': page, 'total_pages': 400},
+                              name='/reading_position/[id]', catch_response=True) as r:
+            check(r)
+
+    @task(1)
+    def update_progress(self):
+        if not self.book_ids:
+            return
+        book_id = random.choice(self.book_ids)
+        status = random.choice(STATUSES)
+        data = {'reading_status': status, 'current_page': str(random.randint(0, 400)),
+                'total_pages': '400', 'start_date': '', 'finish_date': ''}
+        with self.client.post(f'/update_progress/{book_id}', data=data,
+                              name='/update_progress/[id]', catch_response=True) as r:
+            check(r)
+
+
+class Uploader(LibraryUser):
+    """Adds books with attached files in bursts"""
+    weight = 1
+    wait_time = between(5, 15)
+    seed_books = 5
+
+    @task
+    def upload_burst(self):
+        for _ in range(random.randint(1, 5)):
+            self.add_book()
+        self.refresh_ids()
+
+
+class LoginBurst(HttpUser):
+    """Repeated logins (right and wrong passwords), e.g. after a session expiry wave"""
+    weight = 1
+    wait_time = between(0.2, 1)
+
+    def on_start(self):
+        self.username = f'burst_{random.getrandbits(32):08x}_{next(_ids)}'
+        self.client.post('/register', data={'username': self.username, 'password': 'load-test',
+                                            'confirm': 'load-test'}, name='/register')
+
+    @task
+    def login(self):
+        password = 'load-test' if random.random() < 0.8 else 'wrong'
+        with self.client.post('/login', data={'username': self.username, 'password': password},
+                              name='/login', catch_response=True) as r:
+            check(r)
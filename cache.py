@@ -0,0 +1,136 @@
+"""Small thread-safe in-process caches"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    Keys are usually (id, version) tuples, so a stale version is simply never
+    looked up again and ages out; invalidate() drops every version of an id
+    eagerly.
+    """
+
+    def __init__(self, max_entries, metrics=None, name='cache'):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.by_id = {}
+        self.lock = threading.Lock()
+        self.metrics = metrics
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        if self.metrics:
+            self.metrics.incr(f'{self.name}_hits' if value is not None else f'{self.name}_misses')
+        return value
+
+    def set(self, key, value):
+        item_id = key[0] if isinstance(key, tuple) else key
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.by_id.setdefault(item_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self._forget(old_key)
+
+    def get_or_set(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, item_id):
+        """Drop every cached version of an id"""
+        with self.lock:
+            for key in self.by_id.pop(item_id, ()):
+                self.entries.pop(key, None)
+
+    def invalidate_many(self, item_ids):
+        """Drop every cached version of several ids under one lock acquisition"""
+        with self.lock:
+            for item_id in item_ids:
+                for key in self.by_id.pop(item_id, ()):
+                    self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_id.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _forget(self, key):
+        item_id = key[0] if isinstance(key, tuple) else key
+        keys = self.by_id.get(item_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self.by_id[item_id]
+
+
+class FileHandleCache:
+    """Keeps recently used files open for positional reads (os.pread).
+
+    Handles are reference counted: an evicted handle is only closed once the
+    last reader releases it, so a file descriptor number is never reused
+    under a reader's feet. Entries are revalidated by inode and mtime so a
+    replaced file is reopened.
+    """
+
+    def __init__(self, max_open=64):
+        self.max_open = max_open
+        self.entries = OrderedDict()  # path -> handle dict
+        self.lock = threading.Lock()
+
+    def acquire(self, path):
+        """Return an open handle {'fd', 'size', 'mtime'}; pair with release()"""
+        stat = os.stat(path)
+        with self.lock:
+            handle = self.entries.get(path)
+            if handle and (handle['ino'], handle['mtime']) == (stat.st_ino, stat.st_mtime):
+                self.entries.move_to_end(path)
+                handle['refs'] += 1
+                return handle
+            if handle:
+                self._retire(path)
+            handle = {'fd': os.open(path, os.O_RDONLY), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                      'ino': stat.st_ino, 'refs': 1, 'retired': False}
+            self.entries[path] = handle
+            while len(self.entries) > self.max_open:
+                self._retire(next(iter(self.entries)))
+            return handle
+
+    def release(self, handle):
+        with self.lock:
+            handle['refs'] -= 1
+            if handle['retired'] and handle['refs'] == 0:
+                os.close(handle['fd'])
+
+    def discard(self, path):
+        """Forget a path (e.g. after deleting the file)"""
+        with self.lock:
+            if path in self.entries:
+                self._retire(path)
+
+    def _retire(self, path):
+        handle = self.entries.pop(path)
+        handle['retired'] = True
+        if handle['refs'] == 0:
+            os.close(handle['fd'])
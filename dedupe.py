@@ -0,0 +1,156 @@
+"""Near-duplicate detection for book titles.
+
+Titles are normalized, split into character trigrams and summarized by a
+MinHash signature. Signatures are banded (LSH) so a lookup only compares
+against books sharing at least one band bucket instead of the whole library;
+candidates are then confirmed with exact trigram Jaccard similarity.
+"""
+import re
+import threading
+import unicodedata
+import zlib
+
+NUM_HASHES = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_HASHES // BANDS
+THRESHOLD = 0.7
+
+_LEADING_ARTICLE = re.compile(r'^(the|a|an)\s+')
+_NON_WORD = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lowercase, strip accents, punctuation and a leading article"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _SPACES.sub(' ', _NON_WORD.sub(' ', text)).strip()
+    return _LEADING_ARTICLE.sub('', text)
+
+
+def trigrams(normalized):
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def signature(grams):
+    """One-permutation MinHash: hash each gram once, keep the minimum per bin.
+
+    Empty bins borrow the next non-empty bin's value (densification), so the
+    cost is one hash per gram instead of one per gram per hash function.
+    """
+    bins = [None] * NUM_HASHES
+    for gram in grams:
+        h = zlib.crc32(gram.encode())
+        slot = h % NUM_HASHES
+        value = h // NUM_HASHES
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    if all(b is None for b in bins):
+        return (0,) * NUM_HASHES
+    for i in range(NUM_HASHES):
+        offset = 1
+        while bins[i] is None:
+            borrowed = bins[(i + offset) % NUM_HASHES]
+            if borrowed is not None:
+                bins[i] = (borrowed, offset)
+            offset += 1
+    return tuple(bins)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TitleIndex:
+    """LSH index over one user's book titles"""
+
+    def __init__(self):
+        self.books = {}    # id -> (title, author, trigrams, band keys)
+        self.buckets = {}  # band key -> set of ids
+        self.lock = threading.Lock()
+
+    def add(self, book_id, title, author=None):
+        grams = trigrams(normalize(title))
+        sig = signature(grams)
+        bands = [(i, sig[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]) for i in range(BANDS)]
+        with self.lock:
+            self._remove(book_id)
+            self.books[book_id] = (title, author, grams, bands)
+            for band in bands:
+                self.buckets.setdefault(band, set()).add(book_id)
+
+    def remove(self, book_id):
+        with self.lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id):
+        entry = self.books.pop(book_id, None)
+        if entry:
+            for band in entry[3]:
+                ids = self.buckets.get(band)
+                if ids:
+                    ids.discard(book_id)
+                    if not ids:
+                        del self.buckets[band]
+
+    def matches(self, title, author=None, exclude=None, threshold=THRESHOLD):
+        """Return [(book_id, title, author, score)] for likely duplicates, best first"""
+        grams = trigrams(normalize(title))
+        sig = signature(grams)
+        candidates = set()
+        with self.lock:
+            for i in range(BANDS):
+                candidates |= self.buckets.get((i, sig[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND]), set())
+            candidates.discard(exclude)
+            entries = [(book_id, self.books[book_id]) for book_id in candidates if book_id in self.books]
+        found = []
+        for book_id, (other_title, other_author, other_grams, _) in entries:
+            score = jaccard(grams, other_grams)
+            # Same title by clearly different authors is usually a different book
+            if author and other_author and not set(normalize(author).split()) & set(normalize(other_author).split()):
+                score -= 0.2
+            if score >= threshold:
+                found.append((book_id, other_title, other_author, round(score, 3)))
+        return sorted(found, key=lambda m: -m[3])
+
+    def clusters(self, threshold=THRESHOLD):
+        """Group every indexed book with its likely duplicates (union-find)
+
+        >>> index = TitleIndex()
+        >>> index.add(7, 'The Name of the Wind', 'Patrick Rothfuss')
+        >>> index.add(3, 'Name of the Wind', 'Rothfuss')
+        >>> index.add(9, 'Dune', 'Frank Herbert')
+        >>> index.clusters()
+        [[3, 7]]
+        >>> for book_id in (10, 11, 12):
+        ...     index.add(book_id, 'The Hobbit', 'J.R.R. Tolkien')
+        >>> sorted(index.clusters())
+        [[3, 7], [10, 11, 12]]
+        """
+        parent = {}
+
+        def find(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        for book_id, (title, author, _, _) in list(self.books.items()):
+            for other_id, _, _, _ in self.matches(title, author, exclude=book_id, threshold=threshold):
+                # Roots must be in parent too, or the smallest id of a group
+                # is never visited below and drops out of its cluster
+                parent.setdefault(book_id, book_id)
+                parent.setdefault(other_id, other_id)
+                root_a, root_b = find(book_id), find(other_id)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        groups = {}
+        for book_id in parent:
+            groups.setdefault(find(book_id), set()).add(book_id)
+        return [sorted(ids) for ids in groups.values() if len(ids) > 1]
+
+    def __len__(self):
+        return len(self.books)
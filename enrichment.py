@@ -0,0 +1,229 @@
+"""Book metadata enrichment by ISBN.
+
+Providers turn a batch of ISBN-13s into metadata dicts (title, author,
+total_pages, cover_url). Enricher puts a persistent TTL cache in front of the
+provider, fans cache misses out in provider-sized batches over a bounded
+thread pool and coalesces concurrent lookups of the same ISBN into a single
+provider call.
+
+The offline pieces (ISBN normalization, the fixture provider) carry doctests:
+
+    python -m doctest enrichment.py
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def normalize_isbn(raw):
+    """Return a valid ISBN-13 for an ISBN-10/13 string, or None
+
+    >>> normalize_isbn('0-306-40615-2')
+    '9780306406157'
+    >>> normalize_isbn('978-0-306-40615-7')
+    '9780306406157'
+    >>> normalize_isbn('080442957X')
+    '9780804429573'
+    >>> normalize_isbn('0-306-40615-3') is None, normalize_isbn('9780306406158') is None, normalize_isbn('') is None
+    (True, True, True)
+    """
+    digits = ''.join(c for c in (raw or '').upper() if c.isdigit() or c == 'X')
+    if len(digits) == 10:
+        if 'X' in digits[:9]:
+            return None
+        total = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(digits))
+        if total % 11:
+            return None
+        digits = '978' + digits[:9]
+        check = (10 - sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(digits)) % 10) % 10
+        return digits + str(check)
+    if len(digits) == 13 and 'X' not in digits:
+        if sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(digits)) % 10:
+            return None
+        return digits
+    return None
+
+
+class FixtureProvider:
+    """Serve metadata from a JSON file mapping ISBN -> metadata (tests, offline use)
+
+    Keys may be written as ISBN-10 or ISBN-13; lookups use ISBN-13.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+    ...     json.dump({'0-306-40615-2': {'title': 'Example'}}, f)
+    >>> FixtureProvider(f.name).lookup(['9780306406157', '9780804429573'])
+    {'9780306406157': {'title': 'Example'}}
+    >>> os.remove(f.name)
+    """
+    name = 'fixture'
+    batch_size = 100
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.records = {normalize_isbn(k): v for k, v in json.load(f).items()}
+
+    def lookup(self, isbns):
+        return {isbn: self.records[isbn] for isbn in isbns if isbn in self.records}
+
+
+class OpenLibraryProvider:
+    """Open Library books API, which accepts many bibkeys per request"""
+    name = 'openlibrary'
+    batch_size = 50
+
+    def __init__(self, base_url='https://openlibrary.org', timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def lookup(self, isbns):
+        query = urllib.parse.urlencode({
+            'bibkeys': ','.join(f'ISBN:{isbn}' for isbn in isbns),
+            'format': 'json',
+            'jscmd': 'data',
+        })
+        with urllib.request.urlopen(f'{self.base_url}/api/books?{query}', timeout=self.timeout) as response:
+            payload = json.load(response)
+        results = {}
+        for key, data in payload.items():
+            authors = data.get('authors') or []
+            cover = data.get('cover') or {}
+            results[key.split(':', 1)[1]] = {
+                'title': data.get('title'),
+                'author': ', '.join(a['name'] for a in authors if a.get('name')) or None,
+                'total_pages': data.get('number_of_pages'),
+                'cover_url': cover.get('medium') or cover.get('large'),
+            }
+        return results
+
+
+def make_provider(spec):
+    """Build a provider from 'openlibrary', 'openlibrary:<base url>' or 'fixture:<path>'"""
+    if not spec or spec == 'none':
+        return None
+    kind, _, arg = spec.partition(':')
+    if kind == 'fixture':
+        return FixtureProvider(arg)
+    if kind == 'openlibrary':
+        return OpenLibraryProvider(arg) if arg else OpenLibraryProvider()
+    raise ValueError(f'Unknown enrichment provider: {spec}')
+
+
+class DiskCache:
+    """SQLite-backed key -> JSON cache with per-entry expiry, safe across threads and processes"""
+
+    def __init__(self, path, ttl):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        with self._connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)')
+
+    def _connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            self.local.db = db
+        return db
+
+    def get_many(self, keys):
+        """Return {key: value} for unexpired entries; cached misses come back as None"""
+        found = {}
+        db = self._connection()
+        now = time.time()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = db.execute(
+                f"SELECT key, value FROM entries WHERE expires_at > ? AND key IN ({','.join('?' * len(chunk))})",
+                [now] + chunk)
+            for key, value in rows:
+                found[key] = json.loads(value)
+        return found
+
+    def set_many(self, items, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._connection() as db:
+            db.executemany('INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                           [(key, json.dumps(value), expires_at) for key, value in items.items()])
+
+    def purge_expired(self):
+        with self._connection() as db:
+            return db.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+class Enricher:
+    """Cached, batched and coalesced metadata lookups"""
+
+    MISS_TTL = 24 * 3600  # retry unknown ISBNs daily, not on every request
+
+    def __init__(self, provider, cache, max_workers=8):
+        self.provider = provider
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrich')
+        # Bulk imports run here, one at a time, so their lookups fan out on
+        # `pool` without ever occupying its threads themselves
+        self.jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix='import')
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, isbn):
+        return self.lookup_many([isbn]).get(normalize_isbn(isbn))
+
+    def lookup_many(self, isbns):
+        """Return {isbn13: metadata} for every ISBN the provider knows"""
+        wanted = {normalize_isbn(i) for i in isbns} - {None}
+        cached = self.cache.get_many(wanted)
+        results = {isbn: data for isbn, data in cached.items() if data}
+        missing = wanted - set(cached)
+
+        # Claim ISBNs nobody is fetching yet; wait on the others' futures
+        waiting, mine = {}, []
+        with self.lock:
+            for isbn in missing:
+                if isbn in self.in_flight:
+                    waiting[isbn] = self.in_flight[isbn]
+                else:
+                    self.in_flight[isbn] = Future()
+                    mine.append(isbn)
+
+        size = self.provider.batch_size
+        batches = [mine[i:i + size] for i in range(0, len(mine), size)]
+        try:
+            for batch, fetched in zip(batches, self.pool.map(self._fetch, batches)):
+                for isbn in batch:
+                    data = fetched.get(isbn)
+                    with self.lock:
+                        future = self.in_flight.pop(isbn)
+                    future.set_result(data)
+                    if data:
+                        results[isbn] = data
+        finally:
+            # Never leave other callers waiting on a claim we failed to resolve
+            with self.lock:
+                leftovers = [self.in_flight.pop(isbn) for isbn in mine if isbn in self.in_flight]
+            for future in leftovers:
+                future.set_result(None)
+
+        for isbn, future in waiting.items():
+            data = future.result()
+            if data:
+                results[isbn] = data
+        return results
+
+    def _fetch(self, batch):
+        try:
+            fetched = self.provider.lookup(batch)
+        except Exception as e:
+            print(f"Enrichment lookup failed for {len(batch)} ISBN(s): {e}")
+            return {}
+        self.cache.set_many({isbn: fetched[isbn] for isbn in batch if isbn in fetched})
+        self.cache.set_many({isbn: None for isbn in batch if isbn not in fetched}, ttl=self.MISS_TTL)
+        return fetched
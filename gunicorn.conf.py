@@ -0,0 +1,51 @@
+"""Production server settings for gunicorn.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported once in the master (preload_app) and forked, so code and
+read-only module state are shared copy-on-write between workers.
+
+Because the code is loaded in the master, SIGHUP only re-forks workers from
+the code already in memory; it does not pick up a deploy. To deploy new code
+without downtime, send SIGUSR2 to start a new master (which loads the new
+code) alongside the old one, then SIGWINCH to the old master to stop its
+workers and SIGQUIT to retire it once the new workers are serving.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# One worker per core by default
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Load the app in the master before forking
+preload_app = True
+
+# Recycle workers after N requests to bound memory growth (jitter avoids
+# every worker restarting at once)
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 100))
+
+# Uploads can be up to 50MB, give slow clients time
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.environ.get('ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def when_ready(server):
+    # Everything allocated during preload is moved out of the GC's tracked
+    # generations so collections in workers don't touch (and copy) those pages
+    gc.freeze()
+    server.log.info("Preloaded app, %s worker(s), recycling every ~%s requests", workers, max_requests)
+
+
+def post_fork(server, worker):
+    # Database connections are opened lazily per request context, so nothing
+    # inherited from the master needs to be reset here
+    server.log.info("Worker %s spawned", worker.pid)
@@ -0,0 +1,93 @@
+"""Consistency checks between the upload folder and books.file_name.
+
+A scan covers one hash bucket of file names: the upload folder is streamed
+with os.scandir and only names whose CRC-32 falls in the bucket are checked,
+while the database side selects the same slice with MySQL's CRC32(), which
+computes the same checksum. Successive runs advance through the buckets, so
+a store with millions of files is covered piece by piece with constant
+memory, and the position survives restarts in a small JSON checkpoint.
+
+Orphans are files no book row (live or soft-deleted, on any shard) points
+at; dangling references are live books whose file is missing. Repair moves
+orphans to uploads/.quarantine and clears dangling file_name values. The
+shards are read one after another, so a user moved meanwhile could be
+missed on both: orphans are never quarantined while a move is in progress,
+and each is looked up again on every shard right before.
+
+Every worker process runs the scan loop. A MySQL named lock on the
+directory shard keeps scans from overlapping, and the last-run time in the
+shared checkpoint lets whichever process comes first after the interval do
+the scan, so the checkpoint advances one bucket per interval however many
+processes there are.
+"""
+import json
+import os
+import time
+import zlib
+
+QUARANTINE = '.quarantine'
+
+
+def bucket_of(name, buckets):
+    return zlib.crc32(name.encode()) % buckets
+
+
+def iter_upload_batches(folder, bucket, buckets, batch_size=1000, min_age=3600):
+    """Yield lists of upload file names in one bucket, never holding more than a batch.
+
+    Files younger than min_age are skipped: an upload is saved before its
+    row is committed, so a fresh file without a row is not yet an orphan.
+    """
+    batch = []
+    now = time.time()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            if bucket_of(entry.name, buckets) != bucket:
+                continue
+            if now - entry.stat().st_mtime < min_age:
+                continue
+            batch.append(entry.name)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def quarantine(folder, name):
+    """Move an orphan aside instead of deleting it; returns its new path.
+
+    A file already quarantined under the same name is never overwritten:
+    the orphan gets a numbered name instead. os.link fails rather than
+    replace an existing target, so this holds even with concurrent scans.
+    """
+    target_dir = os.path.join(folder, QUARANTINE)
+    os.makedirs(target_dir, exist_ok=True)
+    source = os.path.join(folder, name)
+    for attempt in range(1000):
+        target = os.path.join(target_dir, name if attempt == 0 else f'{name}.{attempt}')
+        try:
+            os.link(source, target)
+        except FileExistsError:
+            continue
+        os.remove(source)
+        return target
+    raise FileExistsError(f'Too many quarantined copies of {name}')
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'bucket': 0}
+
+
+def save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
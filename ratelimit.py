@@ -0,0 +1,138 @@
+"""Token-bucket rate limiting and concurrency admission control.
+
+Buckets live in a pluggable backend: MemoryBackend keeps them per process,
+RedisBackend shares them across workers and hosts. ConcurrencyLimiter caps
+in-flight work per process with a short bounded queue, shedding the rest.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """In-process token buckets keyed by string, least recently used evicted past max_keys"""
+
+    def __init__(self, max_keys=100000):
+        self.buckets = OrderedDict()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, capacity, cost=1):
+        """Try to take `cost` tokens. Returns (allowed, seconds until allowed)"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            # Bounded on every insert, so a flood of distinct (allowed) keys
+            # cannot grow the table; the oldest bucket has had the longest to refill
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        return False, (cost - tokens) / rate
+
+
+class RedisBackend:
+    """Token buckets shared through Redis, updated atomically by a Lua script"""
+
+    SCRIPT = """
+    local key = KEYS[1]
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call('HMGET', key, 'tokens', 'last')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - last) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, capacity, cost=1):
+        allowed, tokens = self.script(keys=[f'ratelimit:{key}'], args=[rate, capacity, cost, time.time()])
+        if allowed:
+            return True, 0
+        return False, (cost - float(tokens)) / rate
+
+
+def make_backend(url=None):
+    """Pick a backend from a URL: redis://... for shared state, otherwise in-process"""
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+class ConcurrencyLimiter:
+    """Allow `limit` concurrent holders, queue up to `queue_size` more for `timeout` seconds"""
+
+    def __init__(self, name, limit, queue_size, timeout, metrics):
+        self.name = name
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.waiting = 0
+        self.lock = threading.Lock()
+        self.metrics = metrics
+
+    def acquire(self):
+        """Return True once a slot is held, False if the request should be shed"""
+        if self.semaphore.acquire(blocking=False):
+            return True
+        with self.lock:
+            if self.waiting >= self.queue_size:
+                self.metrics.incr(f'{self.name}_shed')
+                return False
+            self.waiting += 1
+        self.metrics.incr(f'{self.name}_queued')
+        try:
+            acquired = self.semaphore.acquire(timeout=self.timeout)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if not acquired:
+            self.metrics.incr(f'{self.name}_shed')
+        return acquired
+
+    def release(self):
+        self.semaphore.release()
+
+
+class Metrics:
+    """Thread-safe named counters, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, callback):
+        """Register a callable sampled every time metrics are rendered"""
+        self.gauges[name] = callback
+
+    def render(self):
+        with self.lock:
+            lines = [f'bookmaster_{name}_total {value}' for name, value in sorted(self.counters.items())]
+        for name, callback in sorted(self.gauges.items()):
+            lines.append(f'bookmaster_{name} {callback()}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,194 @@
+"""Cover thumbnails, generated once and stored by content hash.
+
+A cover source (an uploaded image, the first page/cover of a PDF, EPUB or
+CBZ, or a downloaded cover URL) is hashed; every size/format pair is written
+to <cache>/<hash[:2]>/<hash>_<width>.<fmt>. Identical covers therefore share
+files, and URLs never change meaning, so they can be cached as immutable.
+
+Pillow is required to write thumbnails and PyMuPDF to render PDF pages;
+without them the corresponding sources are skipped.
+"""
+import hashlib
+import io
+import os
+import posixpath
+import threading
+import time
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+
+SIZES = (96, 200, 400)
+FORMATS = ('webp', 'jpeg')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+
+def _first_image(archive):
+    names = sorted(n for n in archive.namelist() if n.lower().endswith(IMAGE_EXTENSIONS))
+    return archive.read(names[0]) if names else None
+
+
+def _epub_cover(archive):
+    """Find the cover declared in the EPUB package, else the first image"""
+    ns = {'c': 'urn:oasis:names:tc:opendocument:xmlns:container', 'opf': 'http://www.idpf.org/2007/opf'}
+    try:
+        container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+        opf_path = container.find('.//c:rootfile', ns).get('full-path')
+        package = ElementTree.fromstring(archive.read(opf_path))
+        manifest = package.findall('.//opf:manifest/opf:item', ns)
+        cover_id = next((m.get('content') for m in package.findall('.//opf:metadata/opf:meta', ns)
+                         if m.get('name') == 'cover'), None)
+        for item in manifest:
+            if item.get('id') == cover_id or 'cover-image' in (item.get('properties') or ''):
+                href = posixpath.join(posixpath.dirname(opf_path), item.get('href'))
+                return archive.read(posixpath.normpath(href))
+    except (KeyError, AttributeError, ElementTree.ParseError):
+        pass
+    return _first_image(archive)
+
+
+def pillow():
+    """Return PIL.Image, imported on first use so the app starts without loading Pillow; None if missing"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def _pdf_cover(path):
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        return None
+    with fitz.open(path) as document:
+        if document.page_count == 0:
+            return None
+        return document[0].get_pixmap(dpi=72).tobytes('png')
+
+
+def extract_cover(path):
+    """Return cover image bytes embedded in a book file, or None"""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == '.pdf':
+            return _pdf_cover(path)
+        if ext in ('.epub', '.cbz'):
+            with zipfile.ZipFile(path) as archive:
+                return _epub_cover(archive) if ext == '.epub' else _first_image(archive)
+        if ext in IMAGE_EXTENSIONS:
+            with open(path, 'rb') as f:
+                return f.read(MAX_SOURCE_BYTES)
+    except (OSError, zipfile.BadZipFile, RuntimeError) as e:
+        print(f"Could not extract cover from {path}: {e}")
+    return None
+
+
+def download(url, timeout=10):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read(MAX_SOURCE_BYTES)
+
+
+class Thumbnailer:
+    """Writes thumbnails into a content-addressed directory kept under a disk quota"""
+
+    def __init__(self, cache_dir, quota_bytes, workers=2):
+        self.cache_dir = cache_dir
+        self.quota_bytes = quota_bytes
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbs')
+        self.quota_lock = threading.Lock()
+        self.last_quota_check = 0
+
+    def path(self, key, width, fmt):
+        return os.path.join(self.cache_dir, key[:2], f'{key}_{width}.{fmt}')
+
+    def source_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.src')
+
+    def load_source(self, key):
+        """Return a kept source image (see store(keep_source=True)), or None"""
+        try:
+            with open(self.source_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, target, save):
+        # Unique per process and thread; the rename is atomic, so readers never see half a file
+        tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+        save(tmp)
+        os.replace(tmp, target)
+
+    def store(self, source, keep_source=False):
+        """Write every size/format for the source image; return its key or None.
+
+        With keep_source the source bytes are kept next to the thumbnails and
+        exempt from the quota, for covers (uploaded images) that cannot be
+        derived again from the book's file or URL once evicted.
+        """
+        Image = pillow()
+        if not source or Image is None:
+            return None
+        key = hashlib.sha256(source).hexdigest()
+        if keep_source and not os.path.exists(self.source_path(key)):
+            os.makedirs(os.path.dirname(self.source_path(key)), exist_ok=True)
+            def save_source(tmp):
+                with open(tmp, 'wb') as f:
+                    f.write(source)
+            self._write(self.source_path(key), save_source)
+        if all(os.path.exists(self.path(key, w, f)) for w in SIZES for f in FORMATS):
+            return key
+        try:
+            image = Image.open(io.BytesIO(source))
+            image.load()
+        except Exception as e:
+            print(f"Unreadable cover image: {e}")
+            return None
+        image = image.convert('RGB')
+        os.makedirs(os.path.dirname(self.path(key, SIZES[0], FORMATS[0])), exist_ok=True)
+        for width in SIZES:
+            thumb = image.copy()
+            thumb.thumbnail((width, int(width * 1.6)))
+            for fmt in FORMATS:
+                self._write(self.path(key, width, fmt),
+                            lambda tmp: thumb.save(tmp, fmt.upper(), quality=80))
+        self.enforce_quota()
+        return key
+
+    def touch(self, path):
+        """Mark a thumbnail as recently used for the LRU quota"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def enforce_quota(self, min_interval=60):
+        """Delete least recently used thumbnails until the cache fits the quota"""
+        with self.quota_lock:
+            if time.monotonic() - self.last_quota_check < min_interval:
+                return
+            self.last_quota_check = time.monotonic()
+        files = []
+        total = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.src'):
+                    continue  # kept sources are not cache, see store()
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.quota_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.quota_bytes * 0.9:
+                break